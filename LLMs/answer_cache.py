@@ -0,0 +1,45 @@
+"""Persistent cache of the answers of the QA model.
+
+An answer (span, offsets and score) is stored in the response cache under the
+namespace qa#<model id> and the question text plus a hash of its context. A
+rerun of llm_bert.py looks every fallback question up before inference: only
+questions whose context changed, or that the router stopped answering, reach
+the model, and the model is not even loaded when none does. The model id
+(qa_model.qa_model_id) changes with the model name, the backend, the answer
+settings and the local snapshot or hub commit, so a new model never reads old
+answers. It is only resolved when some questions fall back to the model, and
+the cache is not used at all when the weights cannot be identified.
+"""
+import hashlib
+
+from response_cache import get_response_cache
+
+# Une réponse ne dépend que du modèle et de ses entrées : pas d'expiration utile
+ANSWER_TTL = 365 * 24 * 3600
+
+
+def context_hash(context):
+    return hashlib.sha256(context.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, model_id, cache=None):
+        self.namespace = f"qa#{model_id}"
+        self.cache = cache or get_response_cache()
+        self.hits = 0
+        self.misses = 0
+
+    def request(self, question, context):
+        return f"{question}\n{context_hash(context)}"
+
+    def get(self, question, context):
+        """Cached answer dict of (question, context), or None."""
+        hit, answer = self.cache.get(self.namespace, self.request(question, context))
+        if hit:
+            self.hits += 1
+            return answer
+        self.misses += 1
+        return None
+
+    def set(self, question, context, answer):
+        self.cache.set(self.namespace, self.request(question, context), answer, ttl=ANSWER_TTL)
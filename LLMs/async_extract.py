@@ -0,0 +1,136 @@
+import asyncio
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from entity_registry import EntityRegistry
+
+from extractcontext import (
+    assemble_processed_question,
+    formulate_info,
+    get_author_info_from_semopenalex,
+    get_author_name_from_dblp,
+    get_institution_info_from_semopenalex,
+    get_wikipedia_text,
+    question_author_uris,
+)
+from sparql_client import ENDPOINT_SERVICES, set_request_gate
+
+# Requêtes simultanées autorisées par service
+DEFAULT_CONCURRENCY = {"dblp": 8, "semopenalex": 8, "wikipedia": 4}
+# Requêtes par seconde autorisées par service
+DEFAULT_RATE_LIMITS = {"dblp": 20.0, "semopenalex": 20.0, "wikipedia": 10.0}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EndpointLimiter:
+    """Per-service concurrency and rate limits, held around each real network request."""
+
+    def __init__(self, concurrency=None, rate_limits=None):
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.semaphores = {service: threading.BoundedSemaphore(limit) for service, limit in self.concurrency.items()}
+        self.buckets = {service: TokenBucket(rate) for service, rate in rate_limits.items() if rate}
+
+    @contextlib.contextmanager
+    def slot(self, endpoint):
+        service = ENDPOINT_SERVICES.get(endpoint, endpoint)
+        semaphore = self.semaphores.get(service)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            if service in self.buckets:
+                self.buckets[service].acquire()
+            yield
+
+
+async def run_blocking(executor, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def fetch_author_context_async(uri, executor, registry):
+    # Même enchaînement que extractcontext.fetch_author_context, avec les appels bloquants dans des threads
+    author_name = await run_blocking(executor, registry.get, "author_name", uri, get_author_name_from_dblp)
+    if not author_name:
+        return None
+
+    author_details = await run_blocking(executor, registry.get, "author_details", author_name, get_author_info_from_semopenalex)
+    if not (author_details and author_details['results']['bindings']):
+        return None
+
+    author_info = author_details['results']['bindings'][0]
+    member_of_uri = author_info['memberOf']['value']
+    # L'institution et Wikipedia ne dépendent pas l'un de l'autre
+    institution_details, wikipedia_text = await asyncio.gather(
+        run_blocking(executor, registry.get, "institution", member_of_uri, get_institution_info_from_semopenalex),
+        run_blocking(executor, registry.get, "wikipedia", author_name, get_wikipedia_text),
+    )
+    return formulate_info(author_details, institution_details, wikipedia_text)
+
+
+async def build_author_context_async(uri, executor, registry, contexts):
+    # Coalescence côté asyncio : les questions qui citent le même auteur partagent la même tâche
+    task = contexts.get(uri)
+    if task is None:
+        task = asyncio.ensure_future(fetch_author_context_async(uri, executor, registry))
+        contexts[uri] = task
+    return await task
+
+
+async def process_question_async(question, executor, registry, contexts):
+    all_author_uris = question_author_uris(question)
+    author_contexts = await asyncio.gather(
+        *(build_author_context_async(uri, executor, registry, contexts) for uri in all_author_uris)
+    )
+    contexts = [context for context in author_contexts if context is not None]
+    return assemble_processed_question(question, all_author_uris, contexts)
+
+
+async def process_questions_async(questions, registry=None, concurrency=None, rate_limits=None, on_result=None):
+    if registry is None:
+        registry = EntityRegistry()
+    contexts = {}
+    limiter = EndpointLimiter(concurrency, rate_limits)
+    # Les succès de cache ne prennent pas de place dans les limites : prévoir plus de threads que de requêtes en vol
+    executor = ThreadPoolExecutor(max_workers=2 * sum(limiter.concurrency.values()))
+    set_request_gate(limiter.slot)
+    try:
+        tasks = [asyncio.ensure_future(process_question_async(question, executor, registry, contexts)) for question in questions]
+        if on_result is not None:
+            # Résultats transmis dans l'ordre des questions, dès que tout ce qui précède est prêt
+            for task in tasks:
+                on_result(await task)
+        # gather conserve l'ordre des questions : même sortie que le chemin séquentiel
+        return await asyncio.gather(*tasks)
+    finally:
+        set_request_gate(None)
+        executor.shutdown(wait=True)
+
+
+def process_questions_concurrently(questions, registry=None, concurrency=None, rate_limits=None, on_result=None):
+    return asyncio.run(process_questions_async(questions, registry, concurrency, rate_limits, on_result))
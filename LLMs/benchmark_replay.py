@@ -0,0 +1,62 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay_server import ReplayServer
+
+LLMS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_timed(command, cwd, env):
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stderr)
+        raise SystemExit(f"{' '.join(command)} exited with {result.returncode}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline end to end against the local replay server.")
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--input", default=os.path.join(LLMS_DIR, "sch_set2_test_questions.json"))
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrent", action="store_true", help="run extractcontext.py in concurrent mode")
+    parser.add_argument("--rate-limited", action="store_true", help="keep the production rate limits in concurrent mode")
+    parser.add_argument("--llm-bert", action="store_true", help="also time the llm_bert.py loop on the extracted contexts")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixture_dir, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    server.start()
+
+    # Cache en mémoire : chaque exécution mesurée part à froid
+    env = {**os.environ, **server.environment(), "QALD_CACHE_PATH": ":memory:"}
+    env.pop("QALD_RECORD_DIR", None)
+
+    work_dir = tempfile.mkdtemp(prefix="qald-replay-")
+    try:
+        output_file = os.path.join(work_dir, "processed_sch_set2_test_questions.json")
+        command = [sys.executable, os.path.join(LLMS_DIR, "extractcontext.py"), "--input", os.path.abspath(args.input), "--output", output_file]
+        if args.concurrent:
+            command.append("--concurrent")
+            if not args.rate_limited:
+                command.append("--no-rate-limit")
+        elapsed = run_timed(command, work_dir, env)
+        print(f"extractcontext.py: {elapsed:.2f}s")
+
+        if args.llm_bert:
+            elapsed = run_timed([sys.executable, os.path.join(LLMS_DIR, "llm_bert.py")], work_dir, env)
+            print(f"llm_bert.py: {elapsed:.2f}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.shutdown()
+
+    print(f"Replay server: {server.requests} requests, {server.injected_errors} injected errors, {server.missing} missing fixtures")
@@ -0,0 +1,98 @@
+"""Intent-aware pruning of the contexts given to the QA model.
+
+A context of formulate_info holds, for each author, every author metric, every
+institution metric, the homepage and a Wikipedia excerpt. prune_context() keeps
+only the lines the routed intent can be answered from:
+
+    metric of the author       Author + that metric line
+    metric of the institution  Author + Institution + that metric line
+    short name (acronym)       Author + Institution + Homepage + Wikipedia excerpt
+
+Questions without an intent keep the whole context: a metric question the
+router misses may still be answered from its metric lines. Contexts that do not
+decompose into formulate_info blocks are left unchanged too.
+
+    python context_pruning.py processed_sch_set2_test_questions.json
+
+prints the tokens of each question/context pair before and after pruning.
+"""
+import argparse
+
+from entity_table import open_processed_questions, parse_rendered_context
+from intent_router import INSTITUTION, route_question
+
+# Lignes d'un bloc : (libellé affiché, groupe de CONTEXT_BLOCK_RE)
+AUTHOR_METRIC_LINES = {
+    'hindex': ("- hIndex", 'hindex'),
+    'i10Index': ("- i10Index", 'i10Index'),
+    'citedByCount': ("- Cited by count", 'citedByCount'),
+    'worksCount': ("- Works count", 'worksCount'),
+    'myc': ("- Two-year mean citedness", 'myc'),
+}
+INSTITUTION_METRIC_LINES = {
+    'citedByCount': ("- Cited by count", 'inst_citedByCount'),
+    'worksCount': ("- Works count", 'inst_worksCount'),
+    'rorType': ("Type", 'rorType'),
+}
+
+
+def prune_block(block, intent):
+    # intent n'est jamais None ici : prune_context garde alors le contexte entier
+    lines = [f"Author: {block['name']}"]
+    wikipedia = f"Additional information: {block['wikipedia']}..." if block['wikipedia'] else ""
+
+    if intent.entity != INSTITUTION:
+        label, group = AUTHOR_METRIC_LINES[intent.metric]
+        return "\n".join(lines + [f"{label}: {block[group]}"])
+
+    lines.append(f"Institution: {block['inst_name']}")
+    if intent.metric in INSTITUTION_METRIC_LINES:
+        label, group = INSTITUTION_METRIC_LINES[intent.metric]
+        return "\n".join(lines + [f"{label}: {block[group]}"])
+    # Le sigle n'est pas dans le contexte : page d'accueil et Wikipedia sont les seuls indices
+    return "\n".join(lines + [f"Homepage: {block['homepage']}"] + ([wikipedia] if wikipedia else []))
+
+
+def prune_context(context, intent):
+    """Context reduced to the lines relevant to intent (an Intent of intent_router, or None)."""
+    # Sans intention, rien ne dit quelles lignes sont inutiles : contexte complet
+    blocks = parse_rendered_context(context) if context and intent is not None else None
+    if not blocks:
+        return context
+    return "\n\n".join(prune_block(block, intent) for block in blocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the tokens saved by intent-aware context pruning.")
+    parser.add_argument("questions_file", help="processed questions (rendered list or entity table)")
+    parser.add_argument("--tokenizer", help="tokenizer directory or hub name (default: the QA model)")
+    args = parser.parse_args()
+
+    from qa_model import QA_MODEL_NAME, has_model_cache, model_cache_path
+    from transformers import AutoTokenizer
+
+    tokenizer_source = args.tokenizer or (model_cache_path(QA_MODEL_NAME) if has_model_cache(model_cache_path(QA_MODEL_NAME)) else QA_MODEL_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_source)
+
+    processed = open_processed_questions(args.questions_file)
+    questions = [question for question in processed.questions if processed.context(question)]
+    contexts = [processed.context(question) for question in questions]
+    intents = [route_question(question['question']) for question in questions]
+    pruned = [prune_context(context, intent) for context, intent in zip(contexts, intents)]
+    texts = [question['question'] for question in questions]
+    # Longueur de la paire question/contexte telle que le modèle la reçoit, sans troncature
+    before = [len(ids) for ids in tokenizer(texts, contexts)['input_ids']]
+    after = [len(ids) for ids in tokenizer(texts, pruned)['input_ids']]
+
+    by_intent = {}
+    for question, intent, full, short in zip(questions, intents, before, after):
+        label = f"{intent.entity}/{intent.metric}" if intent else "no intent"
+        print(f"{question['id']}  {label:<24} {full:5d} -> {short:4d} tokens")
+        totals = by_intent.setdefault(label, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += full
+        totals[2] += short
+    print()
+    for label, (count, full, short) in sorted(by_intent.items()):
+        print(f"{label:<24} {count:4d} questions, {full / count:6.1f} -> {short / count:6.1f} tokens on average")
+    print(f"{len(questions)} questions: {sum(before)} -> {sum(after)} tokens ({1 - sum(after) / sum(before):.0%} fewer)")
@@ -0,0 +1,58 @@
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+
+class EntityRegistry:
+    """Per-run memo of fetched entities with in-flight request coalescing.
+
+    Each (kind, key) pair is fetched at most once per run: later lookups get
+    the stored value, and lookups that arrive while the first fetch is still
+    running wait for its result instead of sending their own request.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.lookups = Counter()
+        self.fetches = Counter()
+
+    def prime(self, kind, values):
+        # Enregistrer des résultats déjà obtenus par une requête groupée
+        with self._lock:
+            for key, value in values.items():
+                self._values[(kind, key)] = value
+
+    def get(self, kind, key, fetch):
+        entry = (kind, key)
+        with self._lock:
+            self.lookups[kind] += 1
+            if entry in self._values:
+                return self._values[entry]
+            future = self._inflight.get(entry)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[entry] = future
+                self.fetches[kind] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch(key)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[entry]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._values[entry] = value
+            del self._inflight[entry]
+        future.set_result(value)
+        return value
+
+    def summary(self):
+        kinds = sorted(set(self.lookups) | set(self.fetches))
+        return ", ".join(f"{kind}: {self.fetches[kind]} fetched / {self.lookups[kind]} lookups" for kind in kinds)
@@ -0,0 +1,300 @@
+"""Local snapshot of the DBLP, SemOpenAlex and Wikipedia data used by the pipeline.
+
+export_entity_store() resolves every author of the question files once,
+through the batched fetchers of extractcontext.py, and writes the dozen
+properties the pipeline reads (author name and metrics, memberOf, institution
+fields, Wikipedia intro) to an indexed SQLite file. With QALD_ENTITY_STORE set
+to that file (or after use_entity_store()), the fetchers of extractcontext.py
+and llm_bert.py answer from the snapshot instead of the live endpoints.
+
+Values are kept as the literal strings returned by the endpoints so that the
+contexts built from the snapshot are identical to the live ones.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ENTITY_STORE_PATH = os.environ.get("QALD_ENTITY_STORE")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dblp_authors (
+    uri TEXT PRIMARY KEY,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS dblp_authors_name ON dblp_authors (name);
+CREATE TABLE IF NOT EXISTS authors (
+    lookup TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    lookup_lower TEXT NOT NULL,
+    via INTEGER NOT NULL,
+    author TEXT,
+    name TEXT,
+    member_of TEXT,
+    cited_by_count TEXT,
+    works_count TEXT,
+    hindex TEXT,
+    i10_index TEXT,
+    two_yr_mean_citedness TEXT,
+    PRIMARY KEY (lookup, rank)
+);
+CREATE INDEX IF NOT EXISTS authors_lookup_lower ON authors (lookup_lower);
+CREATE TABLE IF NOT EXISTS institutions (
+    uri TEXT PRIMARY KEY,
+    name TEXT,
+    cited_by_count TEXT,
+    works_count TEXT,
+    homepage TEXT,
+    country_code TEXT,
+    ror_type TEXT,
+    acronym TEXT
+);
+CREATE TABLE IF NOT EXISTS wikipedia (
+    title TEXT PRIMARY KEY,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Variable SPARQL -> colonne SQLite
+AUTHOR_COLUMNS = {
+    'author': 'author',
+    'name': 'name',
+    'memberOf': 'member_of',
+    'citedByCount': 'cited_by_count',
+    'worksCount': 'works_count',
+    'hindex': 'hindex',
+    'i10Index': 'i10_index',
+    '2YrMeanCitedness': 'two_yr_mean_citedness',
+}
+INSTITUTION_COLUMNS = {
+    'citedByCount': 'cited_by_count',
+    'worksCount': 'works_count',
+    'homepage': 'homepage',
+    'name': 'name',
+    'countryCode': 'country_code',
+    'rorType': 'ror_type',
+    'acronym': 'acronym',
+}
+URI_VARS = {'author', 'memberOf'}
+
+
+def sparql_term(var, value):
+    return {'type': 'uri' if var in URI_VARS else 'literal', 'value': value}
+
+
+class EntityStore:
+    """Read-only lookups in a snapshot written by export_entity_store().
+
+    Each method returns what the matching live fetcher of extractcontext.py
+    returns. Keys missing from the snapshot read as "not found".
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Entity store {path} does not exist, run entity_store.py first")
+        self.path = path
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.lookups = 0
+
+    def _query(self, sql, params):
+        with self._lock:
+            self.lookups += 1
+            return self._conn.execute(sql, params).fetchall()
+
+    def author_name(self, author_dblp_uri):
+        rows = self._query("SELECT name FROM dblp_authors WHERE uri = ?", (author_dblp_uri,))
+        return rows[0][0] if rows else None
+
+    def institution_details(self, institution_uri):
+        columns = ", ".join(INSTITUTION_COLUMNS.values())
+        rows = self._query(f"SELECT {columns} FROM institutions WHERE uri = ?", (institution_uri,))
+        if not rows:
+            return None
+        institution_info = {var: sparql_term(var, value) for var, value in zip(INSTITUTION_COLUMNS, rows[0]) if value is not None}
+        return {'head': {'vars': list(INSTITUTION_COLUMNS)}, 'results': {'bindings': [institution_info]}}
+
+    def author_details(self, author_name, alternative_names=True):
+        """Author documents as returned by get_authors_info_from_semopenalex, institution columns included.
+
+        The exact lookup name is tried first, then, for names that were not
+        part of the export, a case-insensitive match.
+        alternative_names=False keeps only matches on foaf:name, as in the
+        queries of llm_bert.py.
+        """
+        author_columns = ", ".join(f"a.{column}" for column in AUTHOR_COLUMNS.values())
+        institution_columns = ", ".join(f"i.{column}" for column in INSTITUTION_COLUMNS.values())
+        via_filter = "" if alternative_names else " AND a.via = 1"
+        sql = (
+            f"SELECT {author_columns}, i.uri, {institution_columns} FROM authors a "
+            f"LEFT JOIN institutions i ON i.uri = a.member_of WHERE a.{{key}} = ?{via_filter} ORDER BY a.via, a.rank"
+        )
+        rows = self._query(sql.format(key="lookup"), (author_name,))
+        # Nom exporté sans correspondance : absent de SemOpenAlex, pas de repli
+        if not rows and not self._query("SELECT 1 FROM dblp_authors WHERE name = ? LIMIT 1", (author_name,)):
+            rows = self._query(sql.format(key="lookup_lower"), (author_name.lower(),))
+
+        # Noms préfixés comme dans la requête groupée (FUSED_INSTITUTION_FIELDS)
+        institution_vars = ['inst' + var[0].upper() + var[1:] for var in INSTITUTION_COLUMNS]
+        bindings = []
+        for row in rows:
+            binding = {var: sparql_term(var, value) for var, value in zip(AUTHOR_COLUMNS, row) if value is not None}
+            if row[len(AUTHOR_COLUMNS)] is not None:
+                institution_values = row[len(AUTHOR_COLUMNS) + 1:]
+                binding.update({var: sparql_term(var, value) for var, value in zip(institution_vars, institution_values) if value is not None})
+            bindings.append(binding)
+        return {'head': {'vars': list(AUTHOR_COLUMNS) + institution_vars}, 'results': {'bindings': bindings}}
+
+    def wikipedia_text(self, title):
+        rows = self._query("SELECT text FROM wikipedia WHERE title = ?", (title,))
+        return rows[0][0] if rows else None
+
+    def counts(self):
+        tables = ("dblp_authors", "authors", "institutions", "wikipedia")
+        return {table: self._query(f"SELECT COUNT(*) FROM {table}", ())[0][0] for table in tables}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store_path = ENTITY_STORE_PATH
+_store = None
+_store_lock = threading.Lock()
+
+
+def use_entity_store(path):
+    """Answer lookups from the snapshot at path, or from the live endpoints when path is None."""
+    global _store_path, _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+        _store_path = path
+        _store = None
+
+
+def get_entity_store():
+    global _store
+    if not _store_path:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = EntityStore(_store_path)
+    return _store
+
+
+def export_entity_store(question_files, store_path, dblp_chunk_size=200, semopenalex_chunk_size=50, wikipedia=True):
+    """Fetch every author of question_files once and write the snapshot to store_path."""
+    # Import local : extractcontext importe lui-même ce module
+    import extractcontext
+
+    # L'export interroge toujours les vrais points d'accès (ou le cache de réponses)
+    use_entity_store(None)
+    start = time.perf_counter()
+
+    questions = []
+    for question_file in question_files:
+        with open(question_file, 'r', encoding='utf-8') as f:
+            questions.extend(json.load(f))
+
+    author_uris = extractcontext.collect_author_dblp_uris(questions)
+    author_names = extractcontext.get_author_names_from_dblp(author_uris, dblp_chunk_size)
+    for uri in author_uris:
+        # Tranches en échec : requête individuelle
+        if uri not in author_names:
+            author_names[uri] = extractcontext.get_author_name_from_dblp(uri)
+
+    names = [name for name in dict.fromkeys(author_names.values()) if name]
+    authors_info = extractcontext.get_authors_info_from_semopenalex(names, semopenalex_chunk_size)
+    failed_names = [name for name, author_details in authors_info.items() if author_details is None]
+    if failed_names:
+        print(f"SemOpenAlex lookup failed for {len(failed_names)} names, they will read as not found: {failed_names}")
+
+    author_rows = []
+    institutions = {}
+    unresolved_institutions = set()
+    for name, author_details in authors_info.items():
+        if not author_details:
+            continue
+        fused = 'instName' in author_details['head']['vars']
+        for rank, binding in enumerate(author_details['results']['bindings']):
+            values = [binding.get(var, {}).get('value') for var in AUTHOR_COLUMNS]
+            # 1 : correspondance sur foaf:name, 2 : sur ns2:alternativeName (le nom principal diffère)
+            via = 1 if binding['name']['value'].lower() == name.lower() else 2
+            author_rows.append([name, rank, name.lower(), via] + values)
+            member_of = binding.get('memberOf', {}).get('value')
+            if not member_of:
+                continue
+            if 'instName' in binding:
+                institutions[member_of] = {
+                    field: binding[var]['value']
+                    for var, field in extractcontext.FUSED_INSTITUTION_FIELDS.items() if var in binding
+                }
+            elif not fused:
+                unresolved_institutions.add(member_of)
+
+    # Institutions des documents du repli, sans colonnes institution : requête individuelle
+    for uri in sorted(unresolved_institutions):
+        if uri not in institutions:
+            institution_details = extractcontext.get_institution_info_from_semopenalex(uri)
+            if institution_details:
+                binding = institution_details['results']['bindings'][0]
+                institutions[uri] = {field: term['value'] for field, term in binding.items()}
+
+    wikipedia_rows = []
+    if wikipedia:
+        # Comme fetch_author_context : page lue seulement pour les auteurs trouvés dans SemOpenAlex
+        found_names = [name for name, author_details in authors_info.items() if author_details and author_details['results']['bindings']]
+        wikipedia_texts = extractcontext.get_wikipedia_texts(found_names)
+        for name in found_names:
+            # Lots en échec : requête individuelle
+            text = wikipedia_texts[name] if name in wikipedia_texts else extractcontext.get_wikipedia_text(name)
+            wikipedia_rows.append((name, text))
+
+    # Écriture dans un fichier temporaire puis remplacement : un instantané n'est jamais à moitié écrit
+    tmp_path = f"{store_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO dblp_authors VALUES (?, ?)", author_names.items())
+        conn.executemany(
+            f"INSERT INTO authors (lookup, rank, lookup_lower, via, {', '.join(AUTHOR_COLUMNS.values())}) VALUES ({', '.join('?' * 12)})",
+            author_rows
+        )
+        conn.executemany(
+            f"INSERT INTO institutions (uri, {', '.join(INSTITUTION_COLUMNS.values())}) VALUES ({', '.join('?' * 8)})",
+            [[uri] + [fields.get(field) for field in INSTITUTION_COLUMNS] for uri, fields in institutions.items()]
+        )
+        conn.executemany("INSERT INTO wikipedia VALUES (?, ?)", wikipedia_rows)
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", [
+            ("exported_at", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ("question_files", json.dumps([os.path.basename(path) for path in question_files])),
+            ("dblp_endpoint", extractcontext.DBLP_ENDPOINT),
+            ("semopenalex_endpoint", extractcontext.SEMOPENALEX_ENDPOINT),
+        ])
+    conn.close()
+    os.replace(tmp_path, store_path)
+
+    print(
+        f"Entity store written to {store_path} in {time.perf_counter() - start:.1f}s: "
+        f"{len(author_names)} DBLP authors, {len(author_rows)} SemOpenAlex rows, "
+        f"{len(institutions)} institutions, {len(wikipedia_rows)} Wikipedia pages"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the author/institution data of the question files to a local SQLite store.")
+    parser.add_argument("question_files", nargs="*", default=["sch_set2_test_questions.json"])
+    parser.add_argument("--output", default="entity_store.sqlite3")
+    parser.add_argument("--no-wikipedia", action="store_true", help="do not store the Wikipedia pages")
+    args = parser.parse_args()
+
+    export_entity_store(args.question_files, args.output, wikipedia=not args.no_wikipedia)
@@ -0,0 +1,277 @@
+"""Processed questions stored as an entity table instead of rendered contexts.
+
+Each author and institution record is stored once; questions point to their
+authors by id (the DBLP URI). The context text of formulate_info is rendered
+only when asked for, and memoized per author combination:
+
+    {"format": "qald-entities/1",
+     "authors": {"<https://dblp.org/pid/24/1769>": {"name": ..., "hindex": ..., "institution": ..., "wikipedia": ...}},
+     "institutions": {"https://semopenalex.org/institution/...": {"name": ..., "rorType": ...}},
+     "questions": [{"id": ..., "question": ..., "author_dblp_uri": ..., "authors": [...]}]}
+
+open_processed_questions() reads either this format or the original list of
+rendered questions, so llm_bert.py works with both.
+"""
+import argparse
+import json
+import os
+import re
+
+FORMAT = "qald-entities/1"
+
+AUTHOR_FIELDS = ('name', 'hindex', 'i10Index', 'citedByCount', 'worksCount', '2YrMeanCitedness')
+INSTITUTION_FIELDS = ('name', 'rorType', 'countryCode', 'citedByCount', 'worksCount', 'homepage')
+# formulate_info n'utilise que le début de la page
+WIKIPEDIA_EXCERPT_LENGTH = 500
+
+
+def binding_values(binding, fields):
+    return {field: binding[field]['value'] for field in fields if field in binding}
+
+
+def render_author_context(author, institution, wikipedia_text):
+    """Context text of one author, from flat author/institution records (None when unknown)."""
+    if author is not None:
+        author_name = author.get('name', "Unknown name")
+        author_hindex = author.get('hindex', "Unknown")
+        author_i10index = author.get('i10Index', "Unknown")
+        author_cbc = author.get('citedByCount', "Unknown")
+        author_wc = author.get('worksCount', "Unknown")
+        author_myc = author.get('2YrMeanCitedness', "Unknown")
+    else:
+        author_name = "Unknown"
+        author_hindex = author_i10index = author_cbc = author_wc = author_myc = "Unknown"
+
+    if institution is not None:
+        institution_name = institution.get('name', "Unknown institution")
+        institution_type = institution.get('rorType', "Unknown type")
+        institution_country = institution.get('countryCode', "Unknown country")
+        institution_cbc = institution.get('citedByCount', "Unknown")
+        institution_wc = institution.get('worksCount', "Unknown")
+        institution_homepage = institution.get('homepage', "Unknown")
+    else:
+        institution_name = institution_type = institution_country = institution_cbc = institution_wc = institution_homepage = "Unknown"
+
+    author_info = (
+        f"Author: {author_name}\n"
+        f"Affiliation: {institution_name}\n"
+        f"Numerical metrics:\n"
+        f"- hIndex: {author_hindex}\n"
+        f"- i10Index: {author_i10index}\n"
+        f"- Cited by count: {author_cbc}\n"
+        f"- Works count: {author_wc}\n"
+        f"- Two-year mean citedness: {author_myc}\n"
+    )
+
+    institution_info = (
+        f"Institution: {institution_name}\n"
+        f"Type: {institution_type}\n"
+        f"Location: {institution_country}\n"
+        f"Numerical metrics:\n"
+        f"- Cited by count: {institution_cbc}\n"
+        f"- Works count: {institution_wc}\n"
+        f"Homepage: {institution_homepage}\n"
+    )
+
+    wikipedia_summary = f"Additional information: {wikipedia_text[:WIKIPEDIA_EXCERPT_LENGTH]}..." if wikipedia_text else ""
+
+    return f"{author_info}\n{institution_info}\n{wikipedia_summary}"
+
+
+class EntityTable:
+    """Authors, institutions and questions of an entity-table file, with lazily rendered contexts."""
+
+    def __init__(self, authors=None, institutions=None, questions=None):
+        self.authors = authors if authors is not None else {}
+        self.institutions = institutions if institutions is not None else {}
+        self.questions = questions if questions is not None else []
+        self._contexts = {}
+
+    def add_author(self, author_id, author_details, institution_uri, institution_details, wikipedia_text):
+        # Mêmes documents que ceux passés à formulate_info
+        author = binding_values(author_details['results']['bindings'][0], AUTHOR_FIELDS)
+        if institution_details and institution_details['results']['bindings']:
+            self.institutions.setdefault(institution_uri, binding_values(institution_details['results']['bindings'][0], INSTITUTION_FIELDS))
+            author['institution'] = institution_uri
+        else:
+            author['institution'] = None
+        author['wikipedia'] = wikipedia_text[:WIKIPEDIA_EXCERPT_LENGTH] if wikipedia_text else None
+        self.authors[author_id] = author
+
+    def add_question(self, question, author_dblp_uri, author_ids):
+        self.questions.append({
+            "id": question.get('id'),
+            "question": question.get('question'),
+            "author_dblp_uri": author_dblp_uri,
+            "authors": author_ids,
+        })
+
+    def render_author(self, author_id):
+        author = self.authors[author_id]
+        return render_author_context(author, self.institutions.get(author.get('institution')), author.get('wikipedia'))
+
+    def context(self, question):
+        # Questions converties dont le texte n'a pas pu être décomposé : contexte conservé tel quel
+        if 'context' in question:
+            return question['context']
+        key = tuple(question['authors'])
+        context = self._contexts.get(key)
+        if context is None:
+            context = " ".join(self.render_author(author_id) for author_id in key).strip()
+            self._contexts[key] = context
+        return context
+
+    def rendered_questions(self):
+        # Format d'origine : une liste de questions avec leur contexte rendu
+        return [
+            {"id": question['id'], "question": question['question'], "author_dblp_uri": question['author_dblp_uri'], "context": self.context(question)}
+            for question in self.questions
+        ]
+
+    def to_document(self):
+        return {"format": FORMAT, "authors": self.authors, "institutions": self.institutions, "questions": self.questions}
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_document(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def from_document(cls, document):
+        if document.get('format') != FORMAT:
+            raise ValueError(f"Unsupported entity table format: {document.get('format')}")
+        return cls(document['authors'], document['institutions'], document['questions'])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_document(json.load(f))
+
+
+class RenderedQuestions:
+    """Same interface as EntityTable over the original list of rendered questions."""
+
+    def __init__(self, questions):
+        self.questions = questions
+
+    def context(self, question):
+        return question.get('context', "")
+
+    def rendered_questions(self):
+        return self.questions
+
+
+def open_processed_questions(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if isinstance(document, list):
+        return RenderedQuestions(document)
+    return EntityTable.from_document(document)
+
+
+# Un bloc de formulate_info ; le dernier bloc d'un contexte a perdu ses sauts de ligne finaux (strip)
+CONTEXT_BLOCK_RE = re.compile(
+    r"Author: (?P<name>[^\n]*)\nAffiliation: (?P<affiliation>[^\n]*)\nNumerical metrics:\n"
+    r"- hIndex: (?P<hindex>[^\n]*)\n- i10Index: (?P<i10Index>[^\n]*)\n- Cited by count: (?P<citedByCount>[^\n]*)\n"
+    r"- Works count: (?P<worksCount>[^\n]*)\n- Two-year mean citedness: (?P<myc>[^\n]*)\n\n"
+    r"Institution: (?P<inst_name>[^\n]*)\nType: (?P<rorType>[^\n]*)\nLocation: (?P<countryCode>[^\n]*)\nNumerical metrics:\n"
+    r"- Cited by count: (?P<inst_citedByCount>[^\n]*)\n- Works count: (?P<inst_worksCount>[^\n]*)\nHomepage: (?P<homepage>[^\n]*)"
+    r"(?:\n\n(?:Additional information: (?P<wikipedia>.*?)\.\.\.)?)?(?= Author: |\Z)",
+    re.DOTALL
+)
+
+
+def parse_rendered_context(context):
+    # Liste des blocs d'un contexte rendu, ou None s'il ne se décompose pas
+    blocks = []
+    position = 0
+    while position < len(context):
+        match = CONTEXT_BLOCK_RE.match(context, position)
+        if match is None:
+            return None
+        blocks.append(match.groupdict())
+        position = match.end()
+        if position < len(context):
+            position += 1   # espace entre deux auteurs
+    return blocks
+
+
+def entities_from_block(block):
+    author = {field: block[field] for field in ('name', 'hindex', 'i10Index', 'citedByCount', 'worksCount') if block[field] != "Unknown"}
+    if author.get('name') == "Unknown name":
+        del author['name']
+    if block['myc'] != "Unknown":
+        author['2YrMeanCitedness'] = block['myc']
+    author['wikipedia'] = block['wikipedia']
+
+    institution_values = {
+        'name': (block['inst_name'], "Unknown institution"),
+        'rorType': (block['rorType'], "Unknown type"),
+        'countryCode': (block['countryCode'], "Unknown country"),
+        'citedByCount': (block['inst_citedByCount'], "Unknown"),
+        'worksCount': (block['inst_worksCount'], "Unknown"),
+        'homepage': (block['homepage'], "Unknown"),
+    }
+    if all(value == "Unknown" for value, _ in institution_values.values()):
+        institution = None
+    else:
+        institution = {field: value for field, (value, placeholder) in institution_values.items() if value != placeholder}
+    return author, institution
+
+
+def entity_table_from_rendered(rendered_questions):
+    """Convert the original list of rendered questions, keeping any context that does not round-trip verbatim."""
+    table = EntityTable()
+    institution_ids = {}
+    verbatim = 0
+    for question in rendered_questions:
+        author_dblp_uri = question.get('author_dblp_uri')
+        uris = [author_dblp_uri] if isinstance(author_dblp_uri, str) else list(author_dblp_uri or [])
+        blocks = parse_rendered_context(question.get('context', ""))
+
+        author_ids = []
+        consistent = blocks is not None
+        for position, block in enumerate(blocks or []):
+            author, institution = entities_from_block(block)
+            if institution is not None:
+                key = json.dumps(institution, sort_keys=True)
+                if key not in institution_ids:
+                    institution_ids[key] = institution.get('homepage') or institution.get('name') or key
+                    if institution_ids[key] in table.institutions:
+                        institution_ids[key] = f"{institution_ids[key]}#{len(table.institutions)}"
+                    table.institutions[institution_ids[key]] = institution
+                author['institution'] = institution_ids[key]
+            else:
+                author['institution'] = None
+            # URI DBLP connue seulement si chaque auteur de la question a un contexte
+            author_id = uris[position] if len(blocks) == len(uris) else f"#{author.get('name', position)}"
+            if table.authors.get(author_id, author) != author:
+                consistent = False
+                break
+            table.authors[author_id] = author
+            author_ids.append(author_id)
+
+        table.add_question(question, author_dblp_uri, author_ids)
+        if not consistent or table.context(table.questions[-1]) != question.get('context', ""):
+            table.questions[-1]['context'] = question.get('context', "")
+            verbatim += 1
+
+    print(f"{len(table.questions)} questions, {len(table.authors)} authors, {len(table.institutions)} institutions, "
+          f"{verbatim} contexts kept verbatim")
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert processed questions between the rendered-context list and the entity table.")
+    parser.add_argument("direction", choices=["to-entities", "to-rendered"])
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    args = parser.parse_args()
+
+    if args.direction == "to-entities":
+        with open(args.input_file, 'r', encoding='utf-8') as f:
+            entity_table_from_rendered(json.load(f)).save(args.output_file)
+    else:
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            json.dump(open_processed_questions(args.input_file).rendered_questions(), f, ensure_ascii=False, indent=2)
@@ -1,10 +1,29 @@
+import argparse
 import requests
 import json
 import re
 import os
-import wikipedia
+from entity_registry import EntityRegistry
+from entity_store import get_entity_store, use_entity_store
+from entity_table import AUTHOR_FIELDS, INSTITUTION_FIELDS, EntityTable, binding_values, render_author_context
+from fixtures import record_fixture
+from jsonl_checkpoint import JsonlCheckpointWriter, export_jsonl_to_json
+from response_cache import get_response_cache
+from sparql_client import (
+    DBLP_ENDPOINT,
+    SEMOPENALEX_ENDPOINT,
+    WIKIPEDIA_ENDPOINT,
+    WIKIPEDIA_USER_AGENT,
+    get_sparql_client,
+    post_sparql,
+    print_sparql_metrics,
+)
 
 def get_author_name_from_dblp(author_dblp_uri):
+    store = get_entity_store()
+    if store is not None:
+        return store.author_name(author_dblp_uri)
+
     sparql_query = f"""
     PREFIX dblp: <https://dblp.org/rdf/schema#>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
@@ -14,11 +33,10 @@ def get_author_name_from_dblp(author_dblp_uri):
         {author_dblp_uri} dblp:primaryCreatorName ?name .
     }}
     """
-    endpoint = "https://dblp-april24.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={'query': sparql_query}, headers={'Accept': 'application/sparql-results+json'})
+    endpoint = DBLP_ENDPOINT
+    status_code, results = post_sparql(endpoint, sparql_query)
 
-    if response.status_code == 200:
-        results = response.json()
+    if status_code == 200:
         if results['results']['bindings']:
             name = results['results']['bindings'][0]['name']['value']
             print(f"Author name from DBLP: {name}")
@@ -27,10 +45,81 @@ def get_author_name_from_dblp(author_dblp_uri):
             print(f"No name found for {author_dblp_uri}")
             return None
     else:
-        print(f"Error in SPARQL query execution for DBLP: {response.status_code}")
+        print(f"Error in SPARQL query execution for DBLP: {status_code}")
         return None
 
+def collect_author_dblp_uris(questions):
+    # Toutes les URI DBLP distinctes des questions, dans l'ordre de première apparition
+    uris = []
+    for question in questions:
+        uris.extend(question_author_uris(question))
+    return list(dict.fromkeys(uris))
+
+def get_author_names_from_dblp(author_dblp_uris, chunk_size=200):
+    """Resolve DBLP author URIs with one VALUES query per chunk.
+
+    Maps each `<uri>` to its name, or to None when DBLP has none. URIs of a
+    failed chunk are left out so callers fall back to get_author_name_from_dblp.
+    """
+    store = get_entity_store()
+    if store is not None:
+        return {uri: store.author_name(uri) for uri in dict.fromkeys(author_dblp_uris)}
+
+    endpoint = DBLP_ENDPOINT
+    cache = get_response_cache()
+    cache_namespace = f"{endpoint}#primaryCreatorName"
+    uris = list(dict.fromkeys(author_dblp_uris))
+    names = {}
+
+    # Les noms déjà en cache (y compris les absences) ne sont pas redemandés
+    for uri in uris:
+        hit, name = cache.get(cache_namespace, uri)
+        if hit:
+            names[uri] = name
+    missing_uris = [uri for uri in uris if uri not in names]
+
+    for start in range(0, len(missing_uris), chunk_size):
+        chunk = missing_uris[start:start + chunk_size]
+        values = "\n            ".join(chunk)
+        sparql_query = f"""
+    PREFIX dblp: <https://dblp.org/rdf/schema#>
+
+    SELECT ?author ?name
+    WHERE {{
+        VALUES ?author {{
+            {values}
+        }}
+        ?author dblp:primaryCreatorName ?name .
+    }}
+    """
+        try:
+            status_code, results = post_sparql(endpoint, sparql_query, use_cache=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Error in SPARQL query execution for DBLP: {e}")
+            continue
+
+        if status_code != 200:
+            print(f"Error in SPARQL query execution for DBLP: {status_code}")
+            continue
+
+        for uri in chunk:
+            names[uri] = None
+        for binding in results['results']['bindings']:
+            uri = f"<{binding['author']['value']}>"
+            if uri in names and names[uri] is None:
+                names[uri] = binding['name']['value']
+        for uri in chunk:
+            cache.set(cache_namespace, uri, names[uri], negative=names[uri] is None)
+
+    resolved = sum(1 for name in names.values() if name)
+    print(f"Author names from DBLP: {resolved}/{len(uris)} resolved")
+    return names
+
 def get_author_info_from_semopenalex(author_name):
+    store = get_entity_store()
+    if store is not None:
+        return store.author_details(author_name)
+
     query = f"""
     PREFIX dcterms: <http://purl.org/dc/terms/>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
@@ -68,15 +157,186 @@ def get_author_info_from_semopenalex(author_name):
     }}
     """
 
-    endpoint = "https://semoa.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={"query": query}, headers={"Accept": "application/sparql-results+json"})
-    if response.status_code == 200:
-        return response.json()
+    endpoint = SEMOPENALEX_ENDPOINT
+    status_code, results = post_sparql(endpoint, query)
+    if status_code == 200:
+        return results
     else:
-        print(f"Error fetching data from SemOpenAlex: {response.status_code}")
+        print(f"Error fetching data from SemOpenAlex: {status_code}")
         return None
 
+def sparql_string_literal(value):
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    return f'"{escaped}"'
+
+def name_case_variants(author_name):
+    # Variantes de casse calculées côté client pour éviter le FILTER(lcase(...))
+    return list(dict.fromkeys([author_name, author_name.lower(), author_name.upper(), author_name.title()]))
+
+def get_authors_info_from_semopenalex(author_names, chunk_size=50):
+    """Fetch SemOpenAlex author metrics, joined with their institution, for many names at once.
+
+    Exact literals (with precomputed case variants) are matched through a
+    VALUES list; names left without bindings fall back to the case-insensitive
+    query of get_author_info_from_semopenalex. Maps each name to the same
+    results document that function returns, or to None on error. Documents
+    from the batched query also carry the institution columns read by
+    institution_details_from_author, so no separate institution query is needed.
+    A chunk whose request fails goes to the per-name fallback; names whose
+    fallback request fails too are left out.
+    """
+    store = get_entity_store()
+    if store is not None:
+        return {name: store.author_details(name) for name in dict.fromkeys(author_names) if name}
+
+    endpoint = SEMOPENALEX_ENDPOINT
+    cache = get_response_cache()
+    cache_namespace = f"{endpoint}#author-institution"
+    names = [name for name in dict.fromkeys(author_names) if name]
+    authors_info = {}
+
+    for name in names:
+        hit, author_details = cache.get(cache_namespace, name)
+        if hit:
+            authors_info[name] = author_details
+    missing_names = [name for name in names if name not in authors_info]
+
+    for start in range(0, len(missing_names), chunk_size):
+        chunk = missing_names[start:start + chunk_size]
+        values = "\n            ".join(
+            f"({sparql_string_literal(name)} {sparql_string_literal(variant)})"
+            for name in chunk
+            for variant in name_case_variants(name)
+        )
+        query = f"""
+    PREFIX foaf: <http://xmlns.com/foaf/0.1/>
+    PREFIX ns2: <https://semopenalex.org/ontology/>
+    PREFIX org: <http://www.w3.org/ns/org#>
+    PREFIX ns3: <http://purl.org/spar/bido/>
+    PREFIX ns4: <https://dbpedia.org/property/>
+
+    SELECT ?lookup ?via ?author ?name ?memberOf ?citedByCount ?worksCount ?hindex ?i10Index ?2YrMeanCitedness
+           ?instCitedByCount ?instWorksCount ?instHomepage ?instName ?instCountryCode ?instRorType ?instAcronym
+    WHERE {{
+        VALUES (?lookup ?literal) {{
+            {values}
+        }}
+        {{
+            ?author foaf:name ?literal .
+            BIND(?literal AS ?name)
+            BIND(1 AS ?via)
+        }}
+        UNION
+        {{
+            ?author ns2:alternativeName ?literal .
+            ?author foaf:name ?name .
+            BIND(2 AS ?via)
+            FILTER(lcase(str(?literal)) != lcase(str(?name)))
+        }}
+        ?author org:memberOf ?memberOf .
+        ?author ns2:citedByCount ?citedByCount .
+        ?author ns2:worksCount ?worksCount .
+        ?author ns3:h-index ?hindex .
+        ?author ns2:2YrMeanCitedness ?2YrMeanCitedness .
+        ?author ns2:i10Index ?i10Index .
+
+        # Mêmes conditions que get_institution_info_from_semopenalex : tout ou rien
+        OPTIONAL {{
+            ?memberOf a ns2:Institution ;
+                ns2:citedByCount ?instCitedByCount ;
+                ns2:worksCount ?instWorksCount ;
+                foaf:homepage ?instHomepage ;
+                foaf:name ?instName ;
+                ns4:countryCode ?instCountryCode ;
+                ns2:rorType ?instRorType .
+            OPTIONAL {{ ?memberOf ns4:acronym ?instAcronym . }}
+        }}
+    }}
+    """
+        try:
+            status_code, results = post_sparql(endpoint, query, use_cache=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching batched data from SemOpenAlex: {e}")
+            continue
+        if status_code != 200:
+            print(f"Error fetching batched data from SemOpenAlex: {status_code}")
+            continue
+
+        head_vars = [var for var in results['head']['vars'] if var not in ('lookup', 'via')]
+        grouped = {name: [] for name in chunk}
+        for binding in results['results']['bindings']:
+            lookup = binding.pop('lookup')['value']
+            via = int(binding.pop('via')['value'])
+            if lookup in grouped:
+                grouped[lookup].append((via, binding))
+
+        for name, matches in grouped.items():
+            if matches:
+                # Les correspondances sur foaf:name passent avant celles sur alternativeName, comme dans l'UNION d'origine
+                matches.sort(key=lambda match: match[0])
+                authors_info[name] = {
+                    'head': {'vars': head_vars},
+                    'results': {'bindings': [binding for _, binding in matches]}
+                }
+
+    # Repli sur le filtre insensible à la casse pour les noms sans correspondance exacte
+    unmatched = [name for name in missing_names if name not in authors_info]
+    if unmatched:
+        print(f"SemOpenAlex exact match missed {len(unmatched)}/{len(missing_names)} names, falling back to case-insensitive lookup")
+    for name in unmatched:
+        try:
+            authors_info[name] = get_author_info_from_semopenalex(name)
+        except requests.exceptions.RequestException as e:
+            # Nom laissé de côté : il sera redemandé au traitement de sa question
+            print(f"Error fetching data from SemOpenAlex for {name}: {e}")
+
+    for name in missing_names:
+        author_details = authors_info.get(name)
+        if author_details is not None:
+            cache.set(cache_namespace, name, author_details, negative=not author_details['results']['bindings'])
+
+    return authors_info
+
+# Colonnes institution de la requête groupée -> noms utilisés par get_institution_info_from_semopenalex
+FUSED_INSTITUTION_FIELDS = {
+    'instCitedByCount': 'citedByCount',
+    'instWorksCount': 'worksCount',
+    'instHomepage': 'homepage',
+    'instName': 'name',
+    'instCountryCode': 'countryCode',
+    'instRorType': 'rorType',
+    'instAcronym': 'acronym',
+}
+
+def institution_details_from_author(author_details):
+    """Return (institution_uri, institution_details) from a batched author document.
+
+    institution_details has the shape returned by
+    get_institution_info_from_semopenalex (None when the institution lacks
+    one of the required properties). Documents that did not come from the
+    batched query give (None, None) and the institution must be fetched.
+    """
+    if not (author_details and author_details['results']['bindings']):
+        return None, None
+    if 'instName' not in author_details['head']['vars']:
+        return None, None
+
+    author_info = author_details['results']['bindings'][0]
+    institution_uri = author_info['memberOf']['value']
+    if 'instName' not in author_info:
+        return institution_uri, None
+
+    institution_info = {field: author_info[var] for var, field in FUSED_INSTITUTION_FIELDS.items() if var in author_info}
+    return institution_uri, {
+        'head': {'vars': list(FUSED_INSTITUTION_FIELDS.values())},
+        'results': {'bindings': [institution_info]}
+    }
+
 def get_institution_info_from_semopenalex(institution_uri):
+    store = get_entity_store()
+    if store is not None:
+        return store.institution_details(institution_uri)
+
     query = f"""
     PREFIX dcterms: <http://purl.org/dc/terms/>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
@@ -96,109 +356,168 @@ def get_institution_info_from_semopenalex(institution_uri):
     }}
     """
 
-    endpoint = "https://semoa.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={"query": query}, headers={"Accept": "application/sparql-results+json"})
-    if response.status_code == 200:
-        results = response.json()
+    endpoint = SEMOPENALEX_ENDPOINT
+    status_code, results = post_sparql(endpoint, query)
+    if status_code == 200:
         if results['results']['bindings']:
             return results
         else:
             return None
     else:
-        print(f"Error in SPARQL query execution for SemOpenAlex: {response.status_code}")
+        print(f"Error in SPARQL query execution for SemOpenAlex: {status_code}")
         return None
 
-def get_wikipedia_text(author_name):
-    try:
-        page = wikipedia.page(author_name)
-        text = page.content
-        text = re.sub(r'\\u[\dA-Fa-f]{4}', '', text)
+# Espace du cache de réponses : introductions seules, distinctes des pages complètes d'avant
+WIKIPEDIA_CACHE_NAMESPACE = "wikipedia#intro"
 
-        return text
-    except:
-        print(f"No Wikipedia page found for {author_name}")
-        return None
+def fetch_wikipedia_intros(titles):
+    """Fetch the plain-text intro of several pages in one MediaWiki API request.
 
+    Title normalization and redirects are followed by the API; missing and
+    disambiguation pages map to None. Returns {title: text or None}, or None
+    when the request fails.
+    """
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': 2,
+        'prop': 'extracts|pageprops',
+        'exintro': 1,
+        'explaintext': 1,
+        'exlimit': 'max',
+        'ppprop': 'disambiguation',
+        'redirects': 1,
+        'titles': '|'.join(titles),
+    }
+    client = get_sparql_client()
+    resolved = {}
+    pages = {}
+    while True:
+        try:
+            response = client.get(WIKIPEDIA_ENDPOINT, params=params, service="wikipedia",
+                                  headers={'User-Agent': WIKIPEDIA_USER_AGENT})
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching Wikipedia pages: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Error fetching Wikipedia pages: {response.status_code}")
+            return None
 
+        data = response.json()
+        query = data.get('query', {})
+        for step in query.get('normalized', []) + query.get('redirects', []):
+            resolved[step['from']] = step['to']
+        for page in query.get('pages', []):
+            # Une suite (continue) peut compléter une page déjà reçue
+            pages.setdefault(page['title'], {}).update(page)
+        if 'continue' not in data:
+            break
+        params = {**params, **data['continue']}
+
+    texts = {}
+    for title in titles:
+        # Titre normalisé, puis cible de la redirection
+        page_title = resolved.get(title, title)
+        page_title = resolved.get(page_title, page_title)
+        page = pages.get(page_title)
+        if page is None or page.get('missing') or page.get('invalid') or 'disambiguation' in page.get('pageprops', {}):
+            texts[title] = None
+        else:
+            texts[title] = re.sub(r'\\u[\dA-Fa-f]{4}', '', page.get('extract', '')) or None
+    return texts
 
-def formulate_info(author_details, institution_details, wikipedia_text):
-    if author_details and author_details['results']['bindings']:
-        author_info = author_details['results']['bindings'][0]
-        author_name = author_info.get('name', {}).get('value', "Unknown name")
-        author_hindex = author_info.get('hindex', {}).get('value', "Unknown")
-        author_i10index = author_info.get('i10Index', {}).get('value', "Unknown")
-        author_cbc = author_info.get('citedByCount', {}).get('value', "Unknown")
-        author_wc = author_info.get('worksCount', {}).get('value', "Unknown")
-        author_myc = author_info.get('2YrMeanCitedness', {}).get('value', "Unknown")
-    else:
-        author_name = "Unknown"
-        author_hindex = author_i10index = author_cbc = author_wc = author_myc = "Unknown"
+def get_wikipedia_texts(author_names, chunk_size=20):
+    """Fetch the Wikipedia intro of many authors, chunk_size titles per API request.
 
-    if institution_details and institution_details['results']['bindings']:
-        inst_info = institution_details['results']['bindings'][0]
-        institution_name = inst_info.get('name', {}).get('value', "Unknown institution")
-        institution_type = inst_info.get('rorType', {}).get('value', "Unknown type")
-        institution_country = inst_info.get('countryCode', {}).get('value', "Unknown country")
-        institution_cbc = inst_info.get('citedByCount', {}).get('value', "Unknown")
-        institution_wc = inst_info.get('worksCount', {}).get('value', "Unknown")
-        institution_homepage = inst_info.get('homepage', {}).get('value', "Unknown")
-    else:
-        institution_name = institution_type = institution_country = institution_cbc = institution_wc = institution_homepage = "Unknown"
-
-    author_info = (
-        f"Author: {author_name}\n"
-        f"Affiliation: {institution_name}\n"
-        f"Numerical metrics:\n"
-        f"- hIndex: {author_hindex}\n"
-        f"- i10Index: {author_i10index}\n"
-        f"- Cited by count: {author_cbc}\n"
-        f"- Works count: {author_wc}\n"
-        f"- Two-year mean citedness: {author_myc}\n"
-    )
+    Maps each name to its intro, or to None when there is no such page.
+    Names of a failed request are left out, like get_author_names_from_dblp.
+    20 is the most extracts the API returns per request.
+    """
+    store = get_entity_store()
+    if store is not None:
+        return {name: store.wikipedia_text(name) for name in dict.fromkeys(author_names) if name}
+
+    cache = get_response_cache()
+    names = [name for name in dict.fromkeys(author_names) if name]
+    texts = {}
+
+    for name in names:
+        hit, text = cache.get(WIKIPEDIA_CACHE_NAMESPACE, name)
+        if hit:
+            texts[name] = text
+    # "|" sépare les titres de l'API : un tel nom ne peut pas être une page
+    missing_names = [name for name in names if name not in texts and '|' not in name]
+    texts.update({name: None for name in names if '|' in name})
+
+    for start in range(0, len(missing_names), chunk_size):
+        chunk = missing_names[start:start + chunk_size]
+        intros = fetch_wikipedia_intros(chunk)
+        if intros is None:
+            continue
+        for name in chunk:
+            text = intros[name]
+            record_fixture("wikipedia", name, text)
+            cache.set(WIKIPEDIA_CACHE_NAMESPACE, name, text, negative=text is None)
+            texts[name] = text
+
+    return texts
 
-    institution_info = (
-        f"Institution: {institution_name}\n"
-        f"Type: {institution_type}\n"
-        f"Location: {institution_country}\n"
-        f"Numerical metrics:\n"
-        f"- Cited by count: {institution_cbc}\n"
-        f"- Works count: {institution_wc}\n"
-        f"Homepage: {institution_homepage}\n"
-    )
+def get_wikipedia_text(author_name):
+    text = get_wikipedia_texts([author_name]).get(author_name)
+    if text is None:
+        print(f"No Wikipedia page found for {author_name}")
+    return text
 
-    wikipedia_summary = f"Additional information: {wikipedia_text[:500]}..." if wikipedia_text else ""
 
-    return f"{author_info}\n{institution_info}\n{wikipedia_summary}"
+def formulate_info(author_details, institution_details, wikipedia_text):
+    author = None
+    if author_details and author_details['results']['bindings']:
+        author = binding_values(author_details['results']['bindings'][0], AUTHOR_FIELDS)
+    institution = None
+    if institution_details and institution_details['results']['bindings']:
+        institution = binding_values(institution_details['results']['bindings'][0], INSTITUTION_FIELDS)
+    return render_author_context(author, institution, wikipedia_text)
 
 
 
 
-def process_question(question):
+def question_author_uris(question):
+    # Liste ordonnée des URI DBLP d'une question (chaîne seule ou liste de dictionnaires)
     author_uris = question.get('author_dblp_uri', [])
-    question_id = question.get('id')
-    question_text = question.get('question')
-
-    contexts = []
-    all_author_uris = []
-
     if isinstance(author_uris, str):
         author_uris = [{'author_dblp_uri': author_uris}]
+    return [uri for author_uri_dict in author_uris for uri in author_uri_dict.values() if uri]
+
+def fetch_author_data(uri, registry):
+    # (author_details, member_of_uri, institution_details, wikipedia_text), ou None si l'auteur est introuvable
+    author_name = registry.get("author_name", uri, get_author_name_from_dblp)
+    if not author_name:
+        return None
+
+    author_details = registry.get("author_details", author_name, get_author_info_from_semopenalex)
+    if not (author_details and author_details['results']['bindings']):
+        return None
 
-    for author_uri_dict in author_uris:
-        for key, uri in author_uri_dict.items():
-            if uri:
-                all_author_uris.append(uri)
-                author_name = get_author_name_from_dblp(uri)
-                if author_name:
-                    author_details = get_author_info_from_semopenalex(author_name)
-                    if author_details and author_details['results']['bindings']:
-                        author_info = author_details['results']['bindings'][0]
-                        member_of_uri = author_info['memberOf']['value']
-                        institution_details = get_institution_info_from_semopenalex(member_of_uri)
-                        wikipedia_text = get_wikipedia_text(author_name)
-                        context = formulate_info(author_details, institution_details, wikipedia_text)
-                        contexts.append(context)
+    author_info = author_details['results']['bindings'][0]
+    member_of_uri = author_info['memberOf']['value']
+    institution_details = registry.get("institution", member_of_uri, get_institution_info_from_semopenalex)
+    wikipedia_text = registry.get("wikipedia", author_name, get_wikipedia_text)
+    return author_details, member_of_uri, institution_details, wikipedia_text
 
+def fetch_author_context(uri, registry):
+    author_data = fetch_author_data(uri, registry)
+    if author_data is None:
+        return None
+    author_details, _, institution_details, wikipedia_text = author_data
+    return formulate_info(author_details, institution_details, wikipedia_text)
+
+def build_author_context(uri, registry=None):
+    # Le contexte d'un auteur ne dépend que de son URI : il est construit une seule fois par exécution
+    if registry is None:
+        registry = EntityRegistry()
+    return registry.get("context", uri, lambda author_uri: fetch_author_context(author_uri, registry))
+
+def assemble_processed_question(question, all_author_uris, contexts):
     combined_context = " ".join(contexts)
 
     if len(all_author_uris) == 1:
@@ -207,40 +526,152 @@ def process_question(question):
         author_uri_representation = all_author_uris
 
     return {
-        "id": question_id,
-        "question": question_text,
+        "id": question.get('id'),
+        "question": question.get('question'),
         "author_dblp_uri": author_uri_representation,
         "context": combined_context.strip()
     }
 
-def process_questions_from_file(input_file_path, output_file_path):
-    processed_questions = []
+def add_question_to_entity_table(question, registry, table):
+    all_author_uris = question_author_uris(question)
 
-    # Charger les questions existantes si le fichier existe
-    if os.path.exists(output_file_path):
-        with open(output_file_path, 'r', encoding='utf-8') as f:
-            processed_questions = json.load(f)
+    author_ids = []
+    for uri in all_author_uris:
+        if uri not in table.authors:
+            author_data = fetch_author_data(uri, registry)
+            if author_data is None:
+                continue
+            author_details, member_of_uri, institution_details, wikipedia_text = author_data
+            table.add_author(uri, author_details, member_of_uri, institution_details, wikipedia_text)
+        author_ids.append(uri)
 
-    processed_ids = set(q['id'] for q in processed_questions)
+    author_uri_representation = all_author_uris[0] if len(all_author_uris) == 1 else all_author_uris
+    table.add_question(question, author_uri_representation, author_ids)
 
-    with open(input_file_path, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
+def process_question(question, registry=None):
+    if registry is None:
+        registry = EntityRegistry()
+    all_author_uris = question_author_uris(question)
 
-    for question in questions:
-        question_id = question.get('id')
-        if question_id not in processed_ids:
-            processed_question = process_question(question)
-            if processed_question:
-                processed_questions.append(processed_question)
+    contexts = []
+    for uri in all_author_uris:
+        context = build_author_context(uri, registry)
+        if context is not None:
+            contexts.append(context)
+
+    return assemble_processed_question(question, all_author_uris, contexts)
+
+def process_questions_from_file(input_file_path, output_file_path, dblp_chunk_size=200, semopenalex_chunk_size=50,
+                                wikipedia_chunk_size=20, concurrent=False, concurrency=None, rate_limits=None,
+                                export_json_path=None, entity_table=False):
+    """Build the context of every question of input_file_path not yet in output_file_path.
+
+    A .json output is rewritten once at the end. A .jsonl output is appended
+    to as each question is processed, with periodic fsync'd checkpoints, and
+    resumes from its id index after a crash; export_json_path then receives
+    the JSON array of all its records. With entity_table=True the output is
+    an entity table (see entity_table.py) and no context is rendered.
+    """
+    processed_questions = []
+    writer = None
+    table = None
+
+    if entity_table:
+        if output_file_path.endswith(".jsonl"):
+            raise ValueError("The entity table is a single JSON document, it cannot be written as JSONL")
+        table = EntityTable.load(output_file_path) if os.path.exists(output_file_path) else EntityTable()
+        processed_ids = set(q['id'] for q in table.questions)
+    elif output_file_path.endswith(".jsonl"):
+        # Reprise depuis l'index compact des id, sans relire les contextes
+        writer = JsonlCheckpointWriter(output_file_path)
+        processed_ids = writer.processed_ids
+    else:
+        # Charger les questions existantes si le fichier existe
+        if os.path.exists(output_file_path):
+            with open(output_file_path, 'r', encoding='utf-8') as f:
+                processed_questions = json.load(f)
+        processed_ids = set(q['id'] for q in processed_questions)
+
+    def emit(processed_question):
+        if not processed_question:
+            return
+        if writer is not None:
+            writer.append(processed_question)
+        else:
+            processed_questions.append(processed_question)
 
-    # Écrire la liste complète des questions traitées dans le fichier de sortie
-    with open(output_file_path, 'w', encoding='utf-8') as f:
-        json.dump(processed_questions, f, ensure_ascii=False, indent=2)
+    try:
+        with open(input_file_path, 'r', encoding='utf-8') as f:
+            questions = json.load(f)
+
+        pending_questions = [q for q in questions if q.get('id') not in processed_ids]
+
+        # Registre des entités de l'exécution : chaque auteur, institution et page n'est récupéré qu'une fois
+        registry = EntityRegistry()
+        # Résoudre tous les noms d'auteurs DBLP en quelques requêtes groupées
+        author_names = get_author_names_from_dblp(collect_author_dblp_uris(pending_questions), dblp_chunk_size)
+        registry.prime("author_name", author_names)
+        # Puis les métriques SemOpenAlex de tous les auteurs trouvés, avec leur institution dans la même requête
+        authors_info = get_authors_info_from_semopenalex([name for name in author_names.values() if name], semopenalex_chunk_size)
+        registry.prime("author_details", authors_info)
+        for author_details in authors_info.values():
+            institution_uri, institution_details = institution_details_from_author(author_details)
+            if institution_uri:
+                registry.prime("institution", {institution_uri: institution_details})
+        # Et l'introduction Wikipedia des auteurs trouvés, par lots de titres
+        found_names = [name for name, author_details in authors_info.items() if author_details and author_details['results']['bindings']]
+        registry.prime("wikipedia", get_wikipedia_texts(found_names, wikipedia_chunk_size))
+
+        if table is not None:
+            # Tout a été récupéré par les requêtes groupées ci-dessus : construction séquentielle
+            for question in pending_questions:
+                add_question_to_entity_table(question, registry, table)
+        elif concurrent:
+            # Import local : async_extract importe lui-même ce module
+            from async_extract import process_questions_concurrently
+            process_questions_concurrently(pending_questions, registry, concurrency, rate_limits, on_result=emit)
+        else:
+            for question in pending_questions:
+                emit(process_question(question, registry))
+    finally:
+        # Interruption ou erreur : les questions déjà écrites restent acquises
+        if writer is not None:
+            writer.close()
+
+    if table is not None:
+        table.save(output_file_path)
+        print(f"Questions traitées écrites dans {output_file_path} ({len(table.authors)} authors, {len(table.institutions)} institutions)")
+    elif writer is None:
+        # Écrire la liste complète des questions traitées dans le fichier de sortie
+        with open(output_file_path, 'w', encoding='utf-8') as f:
+            json.dump(processed_questions, f, ensure_ascii=False, indent=2)
+        print(f"Questions traitées écrites dans {output_file_path}")
+    else:
+        print(f"{len(writer.processed_ids)} questions traitées dans {output_file_path}")
+        if export_json_path:
+            export_jsonl_to_json(output_file_path, export_json_path)
 
-    print(f"Questions traitées écrites dans {output_file_path}")
+    print(f"Entity registry: {registry.summary()}")
+    store = get_entity_store()
+    if store is not None:
+        print(f"Entity store {store.path}: {store.lookups} lookups")
+    print_sparql_metrics()
 
 if __name__ == "__main__":
-    input_file_path = "sch_set2_test_questions.json"
-    output_file_path = "processed_sch_set2_test_questions.json"
-
-    process_questions_from_file(input_file_path, output_file_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the context of each question from DBLP, SemOpenAlex and Wikipedia.")
+    parser.add_argument("--input", default="sch_set2_test_questions.json")
+    parser.add_argument("--output", default="processed_sch_set2_test_questions.json",
+                        help="a .jsonl output is written incrementally and can be resumed after a crash")
+    parser.add_argument("--export-json", help="with a .jsonl output, also write all its records to this JSON file")
+    parser.add_argument("--entity-table", action="store_true", help="write authors and institutions once, with questions pointing to them")
+    parser.add_argument("--concurrent", action="store_true", help="process questions concurrently with asyncio")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the per-endpoint rate limits of --concurrent")
+    parser.add_argument("--entity-store", help="answer lookups from a snapshot written by entity_store.py instead of the live endpoints")
+    args = parser.parse_args()
+
+    if args.entity_store:
+        use_entity_store(args.entity_store)
+
+    rate_limits = {"dblp": 0, "semopenalex": 0, "wikipedia": 0} if args.no_rate_limit else None
+    process_questions_from_file(args.input, args.output, concurrent=args.concurrent, rate_limits=rate_limits,
+                                export_json_path=args.export_json, entity_table=args.entity_table)
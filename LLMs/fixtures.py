@@ -0,0 +1,49 @@
+"""Fixture files for offline record/replay of DBLP, SemOpenAlex and Wikipedia.
+
+With QALD_RECORD_DIR set, every SPARQL response and Wikipedia intro fetched by
+the pipeline is written to <dir>/<service>/<key>.json. replay_server.py then
+serves the same files over HTTP; Wikipedia intros are recorded per title and
+the server assembles batched API responses from them. Record with a cold cache
+(QALD_CACHE_PATH=:memory:) so that every request the pipeline can issue is
+captured.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+from response_cache import normalize_query
+
+RECORD_DIR = os.environ.get("QALD_RECORD_DIR")
+
+
+def fixture_key(request):
+    return hashlib.sha256(normalize_query(request).encode('utf-8')).hexdigest()
+
+
+def record_fixture(service, request, response, status=200):
+    if not RECORD_DIR:
+        return
+    service_dir = os.path.join(RECORD_DIR, service)
+    os.makedirs(service_dir, exist_ok=True)
+    fixture = {"service": service, "request": request, "status": status, "response": response}
+    # Écriture atomique : le mode concurrent peut enregistrer depuis plusieurs threads
+    fd, tmp_path = tempfile.mkstemp(dir=service_dir, suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(service_dir, f"{fixture_key(request)}.json"))
+
+
+def load_fixtures(directory):
+    # {(service, clé): fixture} pour tous les fichiers enregistrés
+    fixtures = {}
+    for service in sorted(os.listdir(directory)):
+        service_dir = os.path.join(directory, service)
+        if not os.path.isdir(service_dir):
+            continue
+        for file_name in os.listdir(service_dir):
+            if file_name.endswith(".json"):
+                with open(os.path.join(service_dir, file_name), 'r', encoding='utf-8') as f:
+                    fixture = json.load(f)
+                fixtures[(service, file_name[:-len(".json")])] = fixture
+    return fixtures
@@ -0,0 +1,142 @@
+"""Intent router for the structured-answer path of llm_bert.py.
+
+INTENT_TABLE declares, for each metric, which entity it belongs to and the
+phrasings that ask for it. Every cue of the table (metrics, institution words,
+quantity and comparison words) is compiled into one regular expression, one
+named group per cue; route_question() scans the question once with it and
+returns an Intent(entity, metric, comparison), or None when the question has to
+be answered by the model.
+
+    python intent_router.py build sch_set2_test_questions.json intent_corpus.json
+    python intent_router.py check intent_corpus.json
+
+intent_corpus.json is the intent the router gave every question of the test set
+when it was built; check reports the questions on which the router now differs.
+The intents written by hand for the difficult questions are in
+test_intent_router.py.
+"""
+import argparse
+import json
+import re
+import sys
+from collections import Counter, namedtuple
+
+Intent = namedtuple('Intent', ['entity', 'metric', 'comparison'])
+
+AUTHOR = "author"
+INSTITUTION = "institution"
+
+# (métrique = clé des bindings SemOpenAlex, entité, formulations explicites, formulations génériques)
+# Les formulations génériques ("papers", "citations") ne comptent qu'avec un mot de quantité.
+# L'ordre des lignes départage une question qui en contient plusieurs.
+INTENT_TABLE = [
+    ('myc', AUTHOR, [r"citedness", r"two ?years? ?mean ?citedness"], []),
+    ('hindex', AUTHOR, [r"h-?index"], []),
+    ('i10Index', AUTHOR, [r"i10-?index"], []),
+    ('acronym', INSTITUTION, [r"short name", r"acronym"], []),
+    ('rorType', INSTITUTION, [r"(?<!-)type", r"kind"], []),
+    ('citedByCount', None, [r"cited ?by ?count", r"citedby"], [r"cited", r"citations?"]),
+    ('worksCount', None, [r"works ?count"], [r"works", r"papers", r"publications", r"articles", r"books"]),
+]
+
+# Mots qui désignent l'institution plutôt que l'auteur ; en minuscules seulement,
+# les noms propres ("Georgia Institute of Technology") décrivent l'auteur
+INSTITUTION_CUES = [r"institutions?", r"institutes?", r"affiliations?", r"affiliated", r"organizations?",
+                    r"organisations?", r"university", r"school", r"company"]
+QUANTITY_CUES = [r"how many", r"number", r"counts?"]
+COMPARISON_CUES = {
+    'higher': [r"more", r"most", r"higher", r"greater", r"larger", r"better", r"superior"],
+    'lower': [r"fewer", r"less", r"lower", r"smaller"],
+}
+
+
+def alternation(words):
+    return "|".join(words)
+
+
+def compile_router():
+    groups = []
+    for position, (_, _, named, generic) in enumerate(INTENT_TABLE):
+        groups.append(rf"(?P<named{position}>{alternation(named)})")
+        if generic:
+            groups.append(rf"(?P<generic{position}>{alternation(generic)})")
+    groups.append(rf"(?P<institution>(?-i:{alternation(INSTITUTION_CUES)}))")
+    for comparison, words in COMPARISON_CUES.items():
+        groups.append(rf"(?P<{comparison}>{alternation(words)})")
+    groups.append(rf"(?P<quantity>{alternation(QUANTITY_CUES)})")
+    return re.compile(rf"\b(?:{'|'.join(groups)})\b", re.IGNORECASE)
+
+
+ROUTER_RE = compile_router()
+
+
+def route_question(question_text):
+    """Intent of a question, or None if no metric of the table is asked for."""
+    cues = set()
+    comparison = None
+    for match in ROUTER_RE.finditer(question_text):
+        cues.add(match.lastgroup)
+        if comparison is None and match.lastgroup in COMPARISON_CUES:
+            comparison = match.lastgroup
+    quantity = comparison is not None or 'quantity' in cues
+    institution = 'institution' in cues
+
+    for position, (metric, entity, _, _) in enumerate(INTENT_TABLE):
+        if f"named{position}" not in cues and not (quantity and f"generic{position}" in cues):
+            continue
+        if entity is None:
+            entity = INSTITUTION if institution else AUTHOR
+        elif entity == INSTITUTION and not institution:
+            # "What type of processing..." : pas une question sur l'institution
+            continue
+        return Intent(entity, metric, comparison)
+    return None
+
+
+def intent_document(intent):
+    return intent._asdict() if intent is not None else None
+
+
+def build_corpus(questions_path, corpus_path):
+    with open(questions_path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    corpus = [
+        {"id": question['id'], "question": question['question'], "intent": intent_document(route_question(question['question']))}
+        for question in questions
+    ]
+    with open(corpus_path, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=2)
+    print(f"{len(corpus)} questions written to {corpus_path}; check compares later versions of the router with it")
+
+
+def check_corpus(corpus_path):
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    routed = Counter()
+    mismatches = 0
+    for entry in corpus:
+        intent = intent_document(route_question(entry['question']))
+        if intent != entry['intent']:
+            mismatches += 1
+            print(f"{entry['id']}: expected {entry['intent']}, got {intent}\n    {entry['question']}")
+        if intent is not None:
+            routed[intent['entity']] += 1
+    print(f"{len(corpus)} questions, {sum(routed.values())} routed to structured answers "
+          f"({routed[AUTHOR]} author, {routed[INSTITUTION]} institution), {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or check the intent corpus of the structured-answer router.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("questions_file")
+    build_parser.add_argument("corpus_file")
+    check_parser = subparsers.add_parser("check")
+    check_parser.add_argument("corpus_file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_corpus(args.questions_file, args.corpus_file)
+    else:
+        sys.exit(1 if check_corpus(args.corpus_file) else 0)
@@ -0,0 +1,152 @@
+"""Append-only JSONL output with fsync'd checkpoints for process_questions_from_file.
+
+Each processed question is written as one line of <output>.jsonl and flushed
+immediately; its id is appended to <output>.jsonl.ids, the compact index read
+on resume. Every checkpoint_every records both files are fsync'd and the byte
+offsets known to be durable are written atomically to
+<output>.jsonl.checkpoint. On open, anything after the checkpoint is checked
+line by line: complete records are kept, a torn last line is truncated away.
+export_jsonl_to_json() produces the usual JSON array from the JSONL file.
+"""
+import argparse
+import json
+import os
+
+
+def fsync_replace(path, payload):
+    # Écriture atomique et durable : fichier temporaire synchronisé puis renommé
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class JsonlCheckpointWriter:
+    """Append processed questions to a JSONL file, resuming from its id index."""
+
+    def __init__(self, path, checkpoint_every=25):
+        self.path = path
+        self.index_path = f"{path}.ids"
+        self.checkpoint_path = f"{path}.checkpoint"
+        self.checkpoint_every = checkpoint_every
+        self.processed_ids = self.recover()
+        self.data = open(self.path, 'ab')
+        self.index = open(self.index_path, 'ab')
+        self.pending = 0
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return 0, 0
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        return checkpoint['data_offset'], checkpoint['index_offset']
+
+    def recover(self):
+        """Return the ids already written, repairing both files after a crash."""
+        data_offset, index_offset = self.read_checkpoint()
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if data_size < data_offset or index_size < index_offset:
+            print(f"Checkpoint of {self.path} is ahead of its files, rebuilding the id index")
+            data_offset = index_offset = 0
+
+        # Partie sûre de l'index : jusqu'au dernier point de contrôle
+        processed_ids = []
+        if index_offset:
+            with open(self.index_path, 'rb') as f:
+                processed_ids = f.read(index_offset).decode('utf-8').splitlines()
+
+        # Au-delà : relire les enregistrements complets, couper une dernière ligne tronquée
+        tail_ids = []
+        good_offset = data_offset
+        if data_size > data_offset:
+            with open(self.path, 'rb') as f:
+                f.seek(data_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    tail_ids.append(str(record.get('id')))
+                    good_offset += len(line)
+            if good_offset < data_size:
+                print(f"Dropping {data_size - good_offset} bytes of incomplete record at the end of {self.path}")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good_offset)
+
+        with open(self.index_path, 'ab') as f:
+            f.truncate(index_offset)
+            f.write("".join(f"{record_id}\n" for record_id in tail_ids).encode('utf-8'))
+        return set(processed_ids + tail_ids)
+
+    def append(self, record):
+        self.data.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        self.data.flush()
+        self.index.write(f"{record.get('id')}\n".encode('utf-8'))
+        self.index.flush()
+        self.processed_ids.add(str(record.get('id')))
+        self.pending += 1
+        if self.pending >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        os.fsync(self.data.fileno())
+        os.fsync(self.index.fileno())
+        checkpoint = {"records": len(self.processed_ids), "data_offset": self.data.tell(), "index_offset": self.index.tell()}
+        fsync_replace(self.checkpoint_path, json.dumps(checkpoint).encode('utf-8'))
+        self.pending = 0
+
+    def close(self):
+        if self.data.closed:
+            return
+        self.checkpoint()
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_jsonl_to_json(jsonl_path, json_path):
+    """Write the records of jsonl_path as a JSON array, as json.dump(..., indent=2) would."""
+    count = 0
+    tmp_path = f"{json_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        for record in iter_jsonl(jsonl_path):
+            # Les chaînes JSON n'ont pas de saut de ligne brut : ré-indenter ligne à ligne est sûr
+            f.write("," if count else "")
+            f.write("\n  " + json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "]")
+    os.replace(tmp_path, json_path)
+    print(f"{count} questions exported from {jsonl_path} to {json_path}")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a JSONL file written by extractcontext.py to a JSON array.")
+    parser.add_argument("jsonl_file")
+    parser.add_argument("json_file")
+    args = parser.parse_args()
+
+    export_jsonl_to_json(args.jsonl_file, args.json_file)
@@ -1,13 +1,34 @@
 import json
+import os
 import requests
-from transformers import BertForQuestionAnswering, AutoTokenizer, pipeline
-
-# Charger le modèle et le tokenizer pour le question-answering
-model = BertForQuestionAnswering.from_pretrained('deepset/bert-base-cased-squad2')
-tokenizer = AutoTokenizer.from_pretrained('deepset/bert-base-cased-squad2')
+from entity_store import get_entity_store
+from answer_cache import AnswerCache
+from context_pruning import prune_context
+from entity_table import open_processed_questions
+from intent_router import INSTITUTION, route_question
+from qa_engine import DEFAULT_BATCH_SIZE, QAEngine
+from qa_model import get_qa_engine, qa_model_id
+from qa_workers import answer_sharded
+from response_cache import get_response_cache
+from sparql_client import DBLP_ENDPOINT, SEMOPENALEX_ENDPOINT, post_sparql, print_sparql_metrics
+
+# Le modèle (deepset/bert-base-cased-squad2) n'est chargé qu'au premier recours, par get_qa_engine() ;
+# les questions sans réponse structurée passent ensuite par lots
+QA_BATCH_SIZE = int(os.environ.get("QALD_QA_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+# Processus de calcul pour les questions laissées au modèle, et fils d'exécution torch par processus
+QA_WORKERS = int(os.environ.get("QALD_QA_WORKERS", 1))
+QA_THREADS = int(os.environ.get("QALD_QA_THREADS", 0)) or None
+# Contexte réduit aux lignes utiles à l'intention de la question (QALD_PRUNE_CONTEXT=0 pour le contexte complet)
+PRUNE_CONTEXT = os.environ.get("QALD_PRUNE_CONTEXT", "1") != "0"
+# Réponses du modèle déjà calculées pour la même question et le même contexte (QALD_ANSWER_CACHE=0 pour recalculer)
+ANSWER_CACHE = os.environ.get("QALD_ANSWER_CACHE", "1") != "0"
 
 # Fonction pour obtenir le nom de l'auteur à partir de DBLP
 def get_author_name_from_dblp(author_dblp_uri):
+    store = get_entity_store()
+    if store is not None:
+        return store.author_name(author_dblp_uri)
+
     sparql_query = f"""
     PREFIX dblp: <https://dblp.org/rdf/schema#>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
@@ -17,18 +38,95 @@ def get_author_name_from_dblp(author_dblp_uri):
         {author_dblp_uri} dblp:creatorName ?name .
     }}
     """
-    endpoint = "https://dblp-april24.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={'query': sparql_query}, headers={'Accept': 'application/sparql-results+json'})
+    endpoint = DBLP_ENDPOINT
+    status_code, results = post_sparql(endpoint, sparql_query)
 
-    if response.status_code == 200:
-        results = response.json()
+    if status_code == 200:
         if results['results']['bindings']:
             return results['results']['bindings'][0]['name']['value']
-    print(f"Errors or no results in DBLP query: {response.text}")
+    print(f"Errors or no results in DBLP query: {status_code}")
     return None
 
+# Fonction pour résoudre en lot les noms d'auteurs DBLP (une requête VALUES par tranche)
+def get_author_names_from_dblp(author_dblp_uris, chunk_size=200):
+    store = get_entity_store()
+    if store is not None:
+        return {uri: store.author_name(uri) for uri in dict.fromkeys(author_dblp_uris)}
+
+    endpoint = DBLP_ENDPOINT
+    cache = get_response_cache()
+    cache_namespace = f"{endpoint}#creatorName"
+    uris = list(dict.fromkeys(author_dblp_uris))
+    names = {}
+
+    for uri in uris:
+        hit, name = cache.get(cache_namespace, uri)
+        if hit:
+            names[uri] = name
+    missing_uris = [uri for uri in uris if uri not in names]
+
+    for start in range(0, len(missing_uris), chunk_size):
+        chunk = missing_uris[start:start + chunk_size]
+        values = "\n            ".join(chunk)
+        sparql_query = f"""
+    PREFIX dblp: <https://dblp.org/rdf/schema#>
+
+    SELECT ?author ?name
+    WHERE {{
+        VALUES ?author {{
+            {values}
+        }}
+        ?author dblp:creatorName ?name .
+    }}
+    """
+        try:
+            status_code, results = post_sparql(endpoint, sparql_query, use_cache=False)
+        except requests.exceptions.RequestException as e:
+            print(f"Errors in DBLP batch query: {e}")
+            continue
+
+        if status_code != 200:
+            print(f"Errors in DBLP batch query: {status_code}")
+            continue
+
+        for uri in chunk:
+            names[uri] = None
+        for binding in results['results']['bindings']:
+            uri = f"<{binding['author']['value']}>"
+            if uri in names and names[uri] is None:
+                names[uri] = binding['name']['value']
+        for uri in chunk:
+            cache.set(cache_namespace, uri, names[uri], negative=names[uri] is None)
+
+    return names
+
+def resolve_author_name(author_dblp_uri, author_names):
+    if author_dblp_uri in author_names:
+        return author_names[author_dblp_uri]
+    return get_author_name_from_dblp(author_dblp_uri)
+
+# Lignes de l'instantané local au format des requêtes ci-dessous (?myc, colonnes inst*)
+def get_author_bindings_from_store(store, author_name):
+    bindings = []
+    for binding in store.author_details(author_name, alternative_names=False)['results']['bindings']:
+        binding = dict(binding)
+        if '2YrMeanCitedness' in binding:
+            binding['myc'] = binding.pop('2YrMeanCitedness')
+        # La requête fusionnée exige ns4:acronym pour renvoyer l'institution
+        if 'instAcronym' not in binding:
+            binding = {key: value for key, value in binding.items() if key not in FUSED_INSTITUTION_FIELDS}
+        bindings.append(binding)
+    return bindings
+
 # Fonction pour obtenir les informations de l'auteur à partir de SemOpenAlex
 def get_author_info_from_semopenalex(author_name):
+    store = get_entity_store()
+    if store is not None:
+        bindings = get_author_bindings_from_store(store, author_name)
+        if not bindings:
+            return None
+        return {key: value for key, value in bindings[0].items() if key not in FUSED_INSTITUTION_FIELDS}
+
     sparql_query = f"""
     PREFIX dcterms: <http://purl.org/dc/terms/>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
@@ -49,11 +147,10 @@ def get_author_info_from_semopenalex(author_name):
         FILTER(lcase(str(?name)) = lcase("{author_name}"))
     }}
     """
-    endpoint = "https://semoa.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={'query': sparql_query}, headers={'Accept': 'application/sparql-results+json'})
+    endpoint = SEMOPENALEX_ENDPOINT
+    status_code, results = post_sparql(endpoint, sparql_query)
 
-    if response.status_code == 200:
-        results = response.json()
+    if status_code == 200:
         if results['results']['bindings']:
             return results['results']['bindings'][0]
 
@@ -81,164 +178,230 @@ def compare_values(value1, value2, comparison_type):
     else:
         return "Invalid comparison type"
 
-# Fonction pour obtenir des informations d'institution à partir de SemOpenAlex
-def get_institution_info_from_semopenalex(institution_uri):
-    if not institution_uri:
-        return None
+# Colonnes institution de la requête fusionnée -> clés lues par les règles de réponse
+FUSED_INSTITUTION_FIELDS = {
+    'instCitedByCount': 'citedByCount',
+    'instWorksCount': 'worksCount',
+    'instHomepage': 'homepage',
+    'instName': 'name',
+    'instCountryCode': 'countryCode',
+    'instRorType': 'rorType',
+    'instAcronym': 'acronym',
+}
+
+# Fonction pour obtenir en un seul aller-retour l'auteur et son institution à partir de SemOpenAlex
+def get_author_and_institution_from_semopenalex(author_name):
+    store = get_entity_store()
+    if store is not None:
+        bindings = get_author_bindings_from_store(store, author_name)
+        if not bindings:
+            return None, None
+        return split_author_and_institution(bindings[0])
 
     sparql_query = f"""
-    PREFIX dcterms: <http://purl.org/dc/terms/>
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
-    PREFIX ns3: <https://semopenalex.org/ontology/>
+    PREFIX ns2: <https://semopenalex.org/ontology/>
+    PREFIX org: <http://www.w3.org/ns/org#>
+    PREFIX ns3: <http://purl.org/spar/bido/>
     PREFIX ns4: <https://dbpedia.org/property/>
-    PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
 
-    SELECT ?citedByCount ?worksCount ?homepage ?name ?countryCode ?rorType
+    SELECT ?author ?name ?memberOf ?citedByCount ?worksCount ?hindex ?i10Index ?myc
+           ?instCitedByCount ?instWorksCount ?instHomepage ?instName ?instCountryCode ?instRorType ?instAcronym
     WHERE {{
-        {institution_uri} a ns3:Institution ;
-        ns3:citedByCount ?citedByCount ;
-        ns3:worksCount ?worksCount ;
-        foaf:homepage ?homepage ;
-        foaf:name ?name ;
-        ns4:countryCode ?countryCode ;
-        ns4:acronym ?acronym ;
-        ns3:rorType ?rorType .
+        ?author foaf:name ?name .
+        ?author org:memberOf ?memberOf .
+        ?author ns2:citedByCount ?citedByCount .
+        ?author ns2:worksCount ?worksCount .
+        ?author ns3:h-index ?hindex .
+        ?author ns2:2YrMeanCitedness ?myc .
+        ?author ns2:i10Index ?i10Index .
+
+        FILTER(lcase(str(?name)) = lcase("{author_name}"))
+
+        OPTIONAL {{
+            ?memberOf a ns2:Institution ;
+                ns2:citedByCount ?instCitedByCount ;
+                ns2:worksCount ?instWorksCount ;
+                foaf:homepage ?instHomepage ;
+                foaf:name ?instName ;
+                ns4:countryCode ?instCountryCode ;
+                ns4:acronym ?instAcronym ;
+                ns2:rorType ?instRorType .
+        }}
     }}
     """
-    endpoint = "https://semoa.skynet.coypu.org/sparql"
-    response = requests.post(endpoint, data={"query": sparql_query}, headers={"Accept": "application/sparql-results+json"})
-    if response.status_code == 200:
-        results = response.json()
-        if results['results']['bindings']:
-            return results['results']['bindings'][0]
-    return None
+    endpoint = SEMOPENALEX_ENDPOINT
+    status_code, results = post_sparql(endpoint, sparql_query)
 
-# Lire le fichier JSON complet (qui est une liste de dictionnaires)
-with open('processed_sch_set2_test_questions.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
+    if status_code != 200 or not results['results']['bindings']:
+        return None, None
+    return split_author_and_institution(results['results']['bindings'][0])
 
-predictions = []
-predictionsa = []
-null_count = 0  # Compteur pour les réponses nulles
-
-# Parcourir chaque question dans le fichier
-for test_data in data:
-    try:
-        question_id = test_data['id']
-        question_text = test_data['question']
-        context = test_data.get('context', "")
+# Enregistrement comparé pour une question à deux auteurs : l'auteur ou son institution
+def get_entity_info(author_name, entity):
+    if not author_name:
+        return None
+    if entity == INSTITUTION:
+        return get_author_and_institution_from_semopenalex(author_name)[1]
+    return get_author_info_from_semopenalex(author_name)
+
+def split_author_and_institution(binding):
+    author_info = {key: value for key, value in binding.items() if key not in FUSED_INSTITUTION_FIELDS}
+    if 'instName' not in binding:
+        return author_info, None
+    institution_info = {field: binding[var] for var, field in FUSED_INSTITUTION_FIELDS.items() if var in binding}
+    return author_info, institution_info
+
+def main():
+    # Lire les questions traitées : liste de contextes rendus, ou table d'entités (extractcontext.py --entity-table)
+    processed = open_processed_questions('processed_sch_set2_test_questions.json')
+    data = processed.questions
+
+    # Résoudre en amont les noms de tous les auteurs du fichier
+    all_author_uris = []
+    for test_data in data:
         author_dblp_uri = test_data.get('author_dblp_uri')
-
-        print(f"Processing ID: {question_id}")
-
-        # Étape 1: Essayer de répondre avec les données de SemOpenAlex ou DBLP
         if isinstance(author_dblp_uri, str):
-            # Cas d'un seul auteur
-            author_name = get_author_name_from_dblp(author_dblp_uri)
-            author_info = get_author_info_from_semopenalex(author_name) if author_name else None
-            institution_info = get_institution_info_from_semopenalex(extract_info(author_info, 'memberOf'))
-
-            if "citedness" in question_text.lower():
-                answer = extract_info(author_info, 'myc')
-            elif "hindex" in question_text.lower():
-                answer = extract_info(author_info, 'hindex')
-            elif "i10index" in question_text.lower():
-                answer = extract_info(author_info, 'i10Index')
-            elif "cited by count" in question_text.lower() or "citedbycount" in question_text.lower() or "citedby count" in question_text.lower():
-                answer = extract_info(author_info, 'citedByCount')
-            elif "works count" in question_text.lower() or "workscount" in question_text.lower():
-                answer = extract_info(author_info, 'worksCount')
-            elif "cited by count" and "where" in question_text.lower():
-              answer = extract_info(institution_info, 'citedByCount')
-            elif "cited by count" and "institution" in question_text.lower():
-              answer = extract_info(institution_info, 'citedByCount')
-            elif "kind" and "institution" in question_text.lower():
-              answer = extract_info(institution_info, 'rorType')
-            elif "type" in question_text.lower():
-              answer = extract_info(institution_info, 'rorType')
-            elif "What is the number of publications" in question_text.lower() and "institution" in question_text.lower():
-              answer = extract_info(institution_info, 'worksCount')
-            elif "What is the number of publications" in question_text.lower() and "affiliation" in question_text.lower():
-              answer = extract_info(institution_info, 'worksCount')
-            elif "What is the number of publications" in question_text.lower() and "cited" in question_text.lower():
-              answer = extract_info(institution_info, 'citedByCount')
-            elif "How many publications" in question_text.lower() and "institution" in question_text.lower():
-              answer = extract_info(institution_info, 'worksCount') 
-            elif "How many publications" in question_text.lower() and "affiliation" in question_text.lower():
-              answer = extract_info(institution_info, 'worksCount')
-            elif "How many books has " in question_text.lower() in question_text.lower():
-              answer = extract_info(author_info, 'worksCount') 
-            elif "short name" in question_text.lower():
-              answer = extract_info(institution_info, 'acronym')
-            else:
-                answer = "Information not available"
+            all_author_uris.append(author_dblp_uri)
+        elif isinstance(author_dblp_uri, list):
+            all_author_uris.extend(author_dblp_uri)
+    author_names = get_author_names_from_dblp(all_author_uris)
+
+    records = []
+    deferred = []  # (position dans records, question, contexte) des questions laissées au modèle
+    null_count = 0  # Compteur pour les réponses nulles
+
+    # Première passe : réponses structurées, les autres questions sont mises de côté pour BERT
+    for test_data in data:
+        try:
+            question_id = test_data['id']
+            question_text = test_data['question']
+            author_dblp_uri = test_data.get('author_dblp_uri')
+
+            print(f"Processing ID: {question_id}")
+
+            # Intention (entité, métrique) reconnue en une passe ; sinon la question va au modèle
+            intent = route_question(question_text)
+
+            # Étape 1: Essayer de répondre avec les données de SemOpenAlex ou DBLP
+            if isinstance(author_dblp_uri, str):
+                # Cas d'un seul auteur
+                author_name = resolve_author_name(author_dblp_uri, author_names)
+                if intent is not None and author_name:
+                    author_info, institution_info = get_author_and_institution_from_semopenalex(author_name)
+                    answer = extract_info(institution_info if intent.entity == INSTITUTION else author_info, intent.metric)
+                else:
+                    answer = "Information not available"
+
+            elif isinstance(author_dblp_uri, list) and len(author_dblp_uri) == 2:
+                # Cas comparatif pour deux auteurs
+                if intent is not None and intent.comparison:
+                    author_name1 = resolve_author_name(author_dblp_uri[0], author_names)
+                    author_name2 = resolve_author_name(author_dblp_uri[1], author_names)
+                    value1 = extract_info(get_entity_info(author_name1, intent.entity), intent.metric)
+                    value2 = extract_info(get_entity_info(author_name2, intent.entity), intent.metric)
+                    answer = compare_values(value1, value2, intent.comparison)
+                else:
+                    answer = "Information not available"
 
-        elif isinstance(author_dblp_uri, list) and len(author_dblp_uri) == 2:
-            # Cas comparatif pour deux auteurs
-            author_name1 = get_author_name_from_dblp(author_dblp_uri[0])
-            author_info1 = get_author_info_from_semopenalex(author_name1) if author_name1 else None
-
-            author_name2 = get_author_name_from_dblp(author_dblp_uri[1])
-            author_info2 = get_author_info_from_semopenalex(author_name2) if author_name2 else None
-
-            if "higher" in question_text.lower() and "hindex" in question_text.lower():
-                hindex1 = extract_info(author_info1, 'hindex')
-                hindex2 = extract_info(author_info2, 'hindex')
-                answer = compare_values(hindex1, hindex2, "higher")
-            elif "higher" in question_text.lower() and "i10index" in question_text.lower():
-                i10index1 = extract_info(author_info1, 'i10Index')
-                i10index2 = extract_info(author_info2, 'i10Index')
-                answer = compare_values(i10index1, i10index2, "higher")
-            elif "higher" in question_text.lower() and "citedbycount" in question_text.lower():
-                citedByCount1 = extract_info(author_info1, 'citedByCount')
-                citedByCount2 = extract_info(author_info2, 'citedByCount')
-                answer = compare_values(citedByCount1, citedByCount2, "higher")
-            elif "higher" and  "works count" in question_text.lower():
-                worksCount1 = extract_info(author_info1, 'worksCount')
-                worksCount2 = extract_info(author_info2, 'worksCount')
-                answer = compare_values(worksCount1, worksCount2, "higher")
-            elif "higher" and "twoyearscitedness" in question_text.lower():
-                myc1 = extract_info(author_info1, 'myc')
-                myc2 = extract_info(author_info2, 'myc')
-                answer = compare_values(myc1, myc2, "higher")
             else:
                 answer = "Information not available"
 
-
+            # Étape 2: Si aucune réponse n'est trouvée via SPARQL, la question passera par le modèle BERT
+            if answer == "Information not available":
+                # Contexte rendu à la demande, mémorisé par combinaison d'auteurs, réduit aux lignes utiles à l'intention
+                context = processed.context(test_data)
+                if PRUNE_CONTEXT:
+                    context = prune_context(context, intent)
+                QAEngine.validate(question_text, context)
+                deferred.append((len(records), question_text, context))
+                answer = None
+
+            records.append({"id": question_id, "question": question_text, "answer": answer, "context": processed.context(test_data)})
+
+        except Exception as e:
+            print(f"An error occurred while processing ID {question_id}: {str(e)}")
+
+    # Identité du modèle résolue seulement s'il y a des questions pour lui ; inconnue, le cache est ignoré
+    answer_cache = None
+    if deferred and ANSWER_CACHE:
+        model_id = qa_model_id()
+        if model_id is None:
+            print("Answer cache: QA model weights not identified, cache bypassed")
         else:
-            answer = "Information not available"
-
-        # Étape 2: Si aucune réponse n'est trouvée via SPARQL, utiliser le modèle BERT pour prédire la réponse
-        if answer == "Information not available":
-            qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
-            result = qa_pipeline(question=question_text, context=context)
-            answer = result['answer']
-
-        if not answer:  # Si l'answer est vide
+            answer_cache = AnswerCache(model_id)
+            remaining = []
+            for index, question, context in deferred:
+                cached = answer_cache.get(question, context)
+                if cached is not None:
+                    records[index]['answer'] = cached['answer']
+                else:
+                    remaining.append((index, question, context))
+            deferred = remaining
+            print(f"Answer cache: {answer_cache.hits} answers reused, {answer_cache.misses} questions left to the model")
+
+    # Deuxième passe : toutes les questions mises de côté, en lots regroupés par longueur
+    if deferred:
+        qa_engine = get_qa_engine(QA_BATCH_SIZE)
+        if answer_cache is not None:
+            # Poids téléchargés au chargement : les réponses vont sous le commit effectivement chargé
+            model_id = qa_model_id()
+            answer_cache = AnswerCache(model_id) if model_id is not None else None
+        try:
+            results = answer_sharded(qa_engine, [(question, context) for _, question, context in deferred], QA_WORKERS, QA_THREADS)
+        except Exception as e:
+            print(f"Batched inference failed ({e}), answering one question at a time")
+            results = []
+            for _, question, context in deferred:
+                try:
+                    results.append(qa_engine.answer(question, context))
+                except Exception as question_error:
+                    results.append(question_error)
+        for (index, question, context), result in zip(deferred, results):
+            if isinstance(result, Exception):
+                print(f"An error occurred while processing ID {records[index]['id']}: {str(result)}")
+                records[index] = None
+            else:
+                records[index]['answer'] = result['answer']
+                if answer_cache is not None:
+                    answer_cache.set(question, context, result)
+        print(f"BERT: {len(deferred)} questions, {qa_engine.forward_passes} batches, {qa_engine.real_tokens} tokens, "
+              f"{qa_engine.padding_ratio():.0%} padding")
+        if qa_engine.token_cache is not None:
+            print(f"Token cache: {qa_engine.token_cache.hits} pairs read, {qa_engine.token_cache.misses} tokenized")
+
+    predictions = []
+    predictionsa = []
+    for record in records:
+        if record is None:
+            continue
+        if not record['answer']:  # Si l'answer est vide
             null_count += 1
-            answer = "No answer found"
+            record['answer'] = "No answer found"
 
         # Ajouter les prédictions à la liste
         predictions.append(
             {
-                "id": question_id,
-                "answer": answer
+                "id": record['id'],
+                "answer": record['answer']
                 }
             )
-        predictionsa.append({"id": question_id, "question": question_text, "answer": answer, "context": context})
+        predictionsa.append(record)
+
+    # Sauvegarder les prédictions dans un fichier JSON
+    with open('answers2.txt', 'w', encoding='utf-8') as outfile:
+        json.dump(predictions, outfile, ensure_ascii=False, indent=4)
 
-    except Exception as e:
-        print(f"An error occurred while processing ID {question_id}: {str(e)}")
+    with open('answers2context.txt', 'w', encoding='utf-8') as outfile:
+        json.dump(predictionsa, outfile, ensure_ascii=False, indent=4)
 
-# Sauvegarder les prédictions dans un fichier JSON
-with open('answers2.txt', 'w', encoding='utf-8') as outfile:
-    json.dump(predictions, outfile, ensure_ascii=False, indent=4)
 
-with open('answers2context.txt', 'w', encoding='utf-8') as outfile:
-    json.dump(predictionsa, outfile, ensure_ascii=False, indent=4)
+    print(f"Processing complete. Total null predictions: {null_count}")
+    print_sparql_metrics()
 
 
-print(f"Processing complete. Total null predictions: {null_count}")
+if __name__ == "__main__":
+    main()
 
 
 
@@ -0,0 +1,83 @@
+"""Selectable CPU inference backends for QAEngine.
+
+A backend is the callable QAEngine runs on each padded batch: numpy
+input_ids/attention_mask/token_type_ids in, numpy start/end logits out.
+
+    torch       the fp32 PyTorch model (qa_engine.torch_backend)
+    torch-int8  the same model with its Linear layers dynamically quantized to int8
+    onnx        the model exported once to ONNX and run by ONNX Runtime
+
+torch, onnx and onnxruntime are imported only by the backend that needs them.
+qa_parity.py compares the answers of each backend with the fp32 model and
+measures their throughput.
+"""
+import os
+
+from qa_engine import torch_backend
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+ONNX_OUTPUTS = ("start_logits", "end_logits")
+ONNX_OPSET = 17
+
+
+def quantized_torch_backend(model):
+    import torch
+
+    # Poids des couches Linear en int8, activations quantifiées à la volée
+    quantized = torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+    return torch_backend(quantized)
+
+
+def export_onnx(model, path):
+    """Export a *ForQuestionAnswering model to path, with dynamic batch and sequence axes."""
+    import torch
+
+    model.eval()
+    dummy = torch.ones((1, 8), dtype=torch.int64)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS + ONNX_OUTPUTS}
+    tmp_path = f"{path}.tmp"
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, (dummy, dummy, torch.zeros_like(dummy)), tmp_path,
+            input_names=list(ONNX_INPUTS), output_names=list(ONNX_OUTPUTS),
+            dynamic_axes=dynamic_axes, opset_version=ONNX_OPSET, dynamo=False,
+        )
+    os.replace(tmp_path, path)
+    print(f"ONNX graph exported to {path}")
+    return path
+
+
+def onnx_backend(onnx_path, threads=None):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def run(input_ids, attention_mask, token_type_ids):
+        start_logits, end_logits = session.run(list(ONNX_OUTPUTS), {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": token_type_ids,
+        })
+        return start_logits, end_logits
+
+    return run
+
+
+def make_backend(name, model, model_dir):
+    """Backend `name` for model; the ONNX graph is exported to model_dir/model.onnx on first use."""
+    if name == "torch":
+        return torch_backend(model)
+    if name == "torch-int8":
+        return quantized_torch_backend(model)
+    if name == "onnx":
+        onnx_path = os.path.join(model_dir, "model.onnx")
+        if not os.path.exists(onnx_path):
+            os.makedirs(model_dir, exist_ok=True)
+            export_onnx(model, onnx_path)
+        return onnx_backend(onnx_path)
+    raise ValueError(f"Unknown QA backend: {name} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,161 @@
+"""Lazy loading of the extractive QA model behind llm_bert.py.
+
+Nothing here imports torch or transformers at module level: llm_bert.py asks
+for the QAEngine only when the first question falls back to the model, so runs
+answered entirely from SPARQL, and scripts importing its helpers, never pay for
+it. The weights are read from a local safetensors snapshot, which
+from_pretrained memory-maps, with the Hugging Face hub switched to offline
+mode. The snapshot is created once:
+
+    python qa_model.py --prepare
+
+Every load prints how the cold start splits between importing torch,
+importing transformers, loading the weights and loading the tokenizer.
+"""
+import argparse
+import os
+import shutil
+import threading
+import time
+
+from qa_backends import BACKENDS, make_backend
+from qa_engine import DEFAULT_BATCH_SIZE, DEFAULT_DOC_STRIDE, DEFAULT_MAX_ANSWER_LEN, DEFAULT_MAX_SEQ_LEN, QAEngine
+
+QA_MODEL_NAME = os.environ.get("QALD_QA_MODEL", "deepset/bert-base-cased-squad2")
+MODEL_CACHE_DIR = os.environ.get("QALD_MODEL_CACHE", "models")
+# Paires question/contexte déjà tokenisées, voir token_cache.py (QALD_TOKEN_CACHE= pour s'en passer)
+TOKEN_CACHE_DIR = os.environ.get("QALD_TOKEN_CACHE", os.path.join(MODEL_CACHE_DIR, "tokens"))
+# torch (fp32), torch-int8 ou onnx, voir qa_backends.py
+QA_BACKEND = os.environ.get("QALD_QA_BACKEND", "torch")
+
+
+def model_cache_path(model_name, cache_dir=MODEL_CACHE_DIR):
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def has_model_cache(path):
+    return all(os.path.exists(os.path.join(path, name)) for name in ("config.json", "model.safetensors", "tokenizer_config.json"))
+
+
+def hub_revision(model_name):
+    """Commit of model_name that from_pretrained loads from the hub, or None when it cannot be resolved."""
+    from huggingface_hub import constants
+
+    # Commit de la copie locale du cache du hub : from_pretrained le met à jour quand il télécharge
+    ref_path = os.path.join(constants.HF_HUB_CACHE, f"models--{model_name.replace('/', '--')}", "refs", "main")
+    try:
+        with open(ref_path, 'r') as f:
+            revision = f.read().strip()
+        if revision:
+            return revision
+    except OSError:
+        pass
+    if constants.HF_HUB_OFFLINE:
+        return None
+    from huggingface_hub import model_info
+    try:
+        return model_info(model_name, timeout=10).sha
+    except Exception as e:
+        print(f"Could not resolve the hub revision of {model_name}: {e}")
+        return None
+
+
+def qa_model_id(model_name=QA_MODEL_NAME, backend=QA_BACKEND, cache_dir=MODEL_CACHE_DIR):
+    """Identity of the answers the QA model gives, known without loading it; None when the weights cannot be identified."""
+    parts = [model_name, backend, f"{DEFAULT_MAX_SEQ_LEN}/{DEFAULT_DOC_STRIDE}/{DEFAULT_MAX_ANSWER_LEN}"]
+    path = model_cache_path(model_name, cache_dir)
+    if has_model_cache(path):
+        # Instantané réécrit par --prepare : nouvelle taille ou date, nouvelles réponses
+        weights = os.stat(os.path.join(path, "model.safetensors"))
+        parts.append(f"{weights.st_size}:{weights.st_mtime_ns}")
+    else:
+        # Modèle lu sur le hub : des poids mis à jour en amont changent le commit, donc la clé
+        revision = hub_revision(model_name)
+        if revision is None:
+            return None
+        parts.append(f"hub:{revision}")
+    return "|".join(parts)
+
+
+def prepare_model_cache(model_name=QA_MODEL_NAME, cache_dir=MODEL_CACHE_DIR):
+    """Download model_name once and store model and tokenizer as a local safetensors snapshot."""
+    from transformers import AutoTokenizer, BertForQuestionAnswering
+
+    path = model_cache_path(model_name, cache_dir)
+    model = BertForQuestionAnswering.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    # Instantané écrit à côté puis renommé : un chargement ne voit jamais un dossier incomplet
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_path)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    print(f"{model_name} saved to {path}")
+    return path
+
+
+def load_qa_model(model_name=QA_MODEL_NAME, cache_dir=MODEL_CACHE_DIR):
+    """Return (model, tokenizer, timings), from the local snapshot when there is one."""
+    path = model_cache_path(model_name, cache_dir)
+    local = has_model_cache(path)
+    if local:
+        # Avant l'import de transformers : huggingface_hub lit ces variables une seule fois
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    else:
+        print(f"No local snapshot of {model_name} in {path}, loading it from the hub (python qa_model.py --prepare creates one)")
+
+    timings = {}
+    start = time.perf_counter()
+    import torch  # noqa: F401
+    timings['import torch'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    from transformers import AutoTokenizer, BertForQuestionAnswering
+    timings['import transformers'] = time.perf_counter() - start
+
+    source = path if local else model_name
+    start = time.perf_counter()
+    model = BertForQuestionAnswering.from_pretrained(source, local_files_only=local, use_safetensors=True if local else None)
+    timings['weights'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(source, local_files_only=local)
+    timings['tokenizer'] = time.perf_counter() - start
+
+    report = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items())
+    print(f"QA model {model_name} loaded from {source} in {sum(timings.values()):.2f}s: {report}")
+    return model, tokenizer, timings
+
+
+_qa_engine = None
+_qa_engine_lock = threading.Lock()
+
+
+def get_qa_engine(batch_size=DEFAULT_BATCH_SIZE, backend=QA_BACKEND):
+    """QAEngine over the QA model, loaded on the first call."""
+    global _qa_engine
+    with _qa_engine_lock:
+        if _qa_engine is None:
+            model, tokenizer, _ = load_qa_model()
+            _qa_engine = QAEngine(tokenizer, make_backend(backend, model, model_cache_path(QA_MODEL_NAME)), batch_size=batch_size,
+                                  token_cache_dir=TOKEN_CACHE_DIR)
+            print(f"QA backend: {backend}")
+        return _qa_engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare the local safetensors snapshot of the QA model and time a cold load.")
+    parser.add_argument("--model", default=QA_MODEL_NAME)
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR)
+    parser.add_argument("--prepare", action="store_true", help="download the model and save it as a local snapshot first")
+    parser.add_argument("--backend", choices=BACKENDS, help="also build this backend (exports the ONNX graph for onnx)")
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare_model_cache(args.model, args.cache_dir)
+    model, _, _ = load_qa_model(args.model, args.cache_dir)
+    if args.backend:
+        make_backend(args.backend, model, model_cache_path(args.model, args.cache_dir))
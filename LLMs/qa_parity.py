@@ -0,0 +1,151 @@
+"""Parity check and throughput benchmark of the QA backends against fp32.
+
+    python qa_parity.py --backend torch-int8 --backend onnx
+    python qa_parity.py --tiny --repeat 3
+
+Each backend answers the same test-set questions as the fp32 torch backend.
+The report gives the share of identical answers, the mean F1 against the fp32
+answers and, for questions with a reference answer in answers_all.json, the F1
+of fp32 and of the backend against it. Throughput is the best of `repeat`
+timed runs, in questions per second. --tiny builds a small, randomly
+initialized BERT with a vocabulary taken from the questions themselves, so the
+check runs without downloading the model (answers are then meaningless, only
+parity and speed are).
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import string
+import tempfile
+import time
+from collections import Counter
+
+from entity_table import open_processed_questions
+from qa_backends import BACKENDS, make_backend
+from qa_engine import DEFAULT_BATCH_SIZE, QAEngine
+from qa_model import MODEL_CACHE_DIR, QA_MODEL_NAME, load_qa_model, model_cache_path
+
+DEFAULT_REFERENCE_ANSWERS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test-data-breakdown", "Answers", "answers_all.json")
+
+
+def normalize_answer(text):
+    # Normalisation SQuAD : minuscules, sans ponctuation ni articles
+    text = "".join(ch for ch in str(text).lower() if ch not in string.punctuation)
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return " ".join(text.split())
+
+
+def f1_score(prediction, reference):
+    prediction_tokens = normalize_answer(prediction).split()
+    reference_tokens = normalize_answer(reference).split()
+    if not prediction_tokens or not reference_tokens:
+        return float(prediction_tokens == reference_tokens)
+    same = sum((Counter(prediction_tokens) & Counter(reference_tokens)).values())
+    if same == 0:
+        return 0.0
+    precision = same / len(prediction_tokens)
+    recall = same / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def build_tiny_model(directory, texts, vocab_size=3000, seed=0):
+    """Small random BertForQuestionAnswering and cased WordPiece tokenizer saved to directory."""
+    import torch
+    from transformers import BertConfig, BertForQuestionAnswering, BertTokenizerFast
+
+    text = " ".join(texts)
+    words = Counter(re.findall(r"\w+|[^\w\s]", text))
+    chars = sorted(set(text) - set(" \n\t"))
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + chars + ["##" + ch for ch in chars]
+    vocab = list(dict.fromkeys(vocab + [word for word, _ in words.most_common(vocab_size)]))
+    os.makedirs(directory, exist_ok=True)
+    vocab_path = os.path.join(directory, "vocab.txt")
+    with open(vocab_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(vocab) + "\n")
+    tokenizer = BertTokenizerFast(vocab_path, do_lower_case=False, model_max_length=512)
+    tokenizer.save_pretrained(directory)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=128, max_position_embeddings=512)
+    model = BertForQuestionAnswering(config).eval()
+    model.save_pretrained(directory, safe_serialization=True)
+    return model, tokenizer
+
+
+def load_examples(questions_path, limit=None):
+    processed = open_processed_questions(questions_path)
+    ids, examples = [], []
+    for question in processed.questions:
+        context = processed.context(question)
+        # Mêmes refus que QAEngine.validate : ces questions n'arrivent jamais au modèle
+        if question.get('question') and context:
+            ids.append(question['id'])
+            examples.append((question['question'], context))
+    if limit:
+        ids, examples = ids[:limit], examples[:limit]
+    return ids, examples
+
+
+def load_reference_answers(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {entry['id']: entry['answer'] for entry in json.load(f) if entry.get('answer')}
+
+
+def run_backend(name, model, tokenizer, model_dir, examples, batch_size, repeat):
+    engine = QAEngine(tokenizer, make_backend(name, model, model_dir), batch_size=batch_size)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        answers = [answer['answer'] for answer in engine.answer_batch(examples)]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return answers, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare QA backends with the fp32 model: answers, F1 and throughput.")
+    parser.add_argument("--backend", action="append", choices=[name for name in BACKENDS if name != "torch"],
+                        help="backend to compare with fp32 (repeatable, default: all)")
+    parser.add_argument("--questions", default="processed_sch_set2_test_questions.json")
+    parser.add_argument("--reference-answers", default=DEFAULT_REFERENCE_ANSWERS)
+    parser.add_argument("--model", default=QA_MODEL_NAME)
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR)
+    parser.add_argument("--tiny", action="store_true", help="use a small randomly initialized BERT built locally")
+    parser.add_argument("--limit", type=int, help="only the first N questions")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per backend, the best one is reported")
+    args = parser.parse_args()
+
+    ids, examples = load_examples(args.questions, args.limit)
+    references = load_reference_answers(args.reference_answers)
+
+    # Modèle jetable de --tiny : supprimé à la fin de la comparaison
+    with tempfile.TemporaryDirectory(prefix="tiny-bert-") if args.tiny else contextlib.nullcontext() as tiny_dir:
+        if args.tiny:
+            model_dir = tiny_dir
+            model, tokenizer = build_tiny_model(model_dir, [text for example in examples for text in example])
+            print(f"Tiny random BERT built in {model_dir}")
+        else:
+            model, tokenizer, _ = load_qa_model(args.model, args.cache_dir)
+            model_dir = model_cache_path(args.model, args.cache_dir)
+
+        backends = ["torch"] + (args.backend or [name for name in BACKENDS if name != "torch"])
+        results = {name: run_backend(name, model, tokenizer, model_dir, examples, args.batch_size, args.repeat) for name in backends}
+
+    fp32_answers, fp32_seconds = results["torch"]
+    referenced = [position for position, question_id in enumerate(ids) if question_id in references]
+    print(f"{len(examples)} questions, {len(referenced)} with a reference answer, batch size {args.batch_size}")
+    for name, (answers, seconds) in results.items():
+        identical = sum(answer == fp32 for answer, fp32 in zip(answers, fp32_answers))
+        f1_fp32 = sum(f1_score(answer, fp32) for answer, fp32 in zip(answers, fp32_answers)) / len(examples)
+        line = (f"{name:>10}: {identical / len(examples):6.1%} identical to fp32, F1 vs fp32 {f1_fp32:.3f}, "
+                f"{len(examples) / seconds:7.1f} questions/s ({fp32_seconds / seconds:.2f}x)")
+        if referenced:
+            f1_reference = sum(f1_score(answers[position], references[ids[position]]) for position in referenced) / len(referenced)
+            line += f", F1 vs reference {f1_reference:.3f}"
+        print(line)
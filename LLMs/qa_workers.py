@@ -0,0 +1,136 @@
+"""Sharded inference of the fallback questions over a pool of worker processes.
+
+One PyTorch process does not use many cores well on small BERT batches, and
+copies of llm_bert.py started side by side fight over the same cores with their
+intra-op threads. answer_sharded() forks N workers after the QA model is
+loaded, so every worker shares its weights copy-on-write, pins each one to
+`threads` intra-op threads with torch.set_num_threads and gives it a shard of
+the questions. The answers are merged back by question position, so
+answers2.txt and answers2context.txt do not depend on the number of workers.
+
+    QALD_QA_WORKERS=4 python llm_bert.py
+    python qa_workers.py --tiny --max-workers 4
+
+The second command is the scaling benchmark: the same questions answered by
+1 to N workers, with the throughput of each and whether the answers match.
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# Moteur hérité par les processus fils au fork, jamais sérialisé
+_worker_engine = None
+
+
+def default_threads(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def init_worker(threads):
+    # Le backend ONNX garde le nombre de fils fixé à la création de sa session
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def answer_shard(shard):
+    positions, examples = shard
+    engine = _worker_engine
+    forward_passes, real_tokens, padded_tokens = engine.forward_passes, engine.real_tokens, engine.padded_tokens
+    answers = engine.answer_batch(examples)
+    counters = (engine.forward_passes - forward_passes, engine.real_tokens - real_tokens, engine.padded_tokens - padded_tokens)
+    return positions, answers, counters
+
+
+def make_shards(examples, workers):
+    # Questions réparties par longueur de contexte décroissante, à tour de rôle : des parts de coût voisin
+    order = sorted(range(len(examples)), key=lambda position: len(examples[position][1]), reverse=True)
+    shards = []
+    for worker in range(workers):
+        positions = order[worker::workers]
+        if positions:
+            shards.append((positions, [examples[position] for position in positions]))
+    return shards
+
+
+def answer_sharded(engine, examples, workers, threads=None):
+    """engine.answer_batch(examples) spread over `workers` forked processes; same order, same answers."""
+    global _worker_engine
+    if workers <= 1 or len(examples) <= 1:
+        return engine.answer_batch(examples)
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("Sharded inference needs fork, answering in a single process")
+        return engine.answer_batch(examples)
+
+    for question, context in examples:
+        engine.validate(question, context)
+    if engine.token_cache is not None:
+        # Tokenisation faite une fois ici : les processus fils héritent des tableaux du cache
+        engine.featurize(examples)
+
+    shards = make_shards(examples, workers)
+    _worker_engine = engine
+    answers = [None] * len(examples)
+    try:
+        context = multiprocessing.get_context("fork")
+        with context.Pool(len(shards), initializer=init_worker, initargs=(threads or default_threads(workers),)) as pool:
+            for positions, shard_answers, counters in pool.imap_unordered(answer_shard, shards):
+                for position, answer in zip(positions, shard_answers):
+                    answers[position] = answer
+                engine.forward_passes += counters[0]
+                engine.real_tokens += counters[1]
+                engine.padded_tokens += counters[2]
+    finally:
+        _worker_engine = None
+    return answers
+
+
+if __name__ == "__main__":
+    from qa_backends import BACKENDS, make_backend
+    from qa_engine import DEFAULT_BATCH_SIZE, QAEngine
+    from qa_model import MODEL_CACHE_DIR, QA_MODEL_NAME, load_qa_model, model_cache_path
+    from qa_parity import build_tiny_model, load_examples
+
+    parser = argparse.ArgumentParser(description="Throughput of sharded QA inference with 1 to N worker processes.")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, help="intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    parser.add_argument("--questions", default="processed_sch_set2_test_questions.json")
+    parser.add_argument("--model", default=QA_MODEL_NAME)
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR)
+    parser.add_argument("--tiny", action="store_true", help="use a small randomly initialized BERT built locally")
+    parser.add_argument("--limit", type=int, help="only the first N questions")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per worker count, the best one is reported")
+    args = parser.parse_args()
+
+    _, examples = load_examples(args.questions, args.limit)
+    # Modèle jetable de --tiny (et son export ONNX) : supprimé à la fin des mesures
+    with tempfile.TemporaryDirectory(prefix="tiny-bert-") if args.tiny else contextlib.nullcontext() as tiny_dir:
+        if args.tiny:
+            model_dir = tiny_dir
+            model, tokenizer = build_tiny_model(model_dir, [text for example in examples for text in example])
+        else:
+            model, tokenizer, _ = load_qa_model(args.model, args.cache_dir)
+            model_dir = model_cache_path(args.model, args.cache_dir)
+        engine = QAEngine(tokenizer, make_backend(args.backend, model, model_dir), batch_size=args.batch_size)
+
+        print(f"{len(examples)} questions, {os.cpu_count()} cores, backend {args.backend}, batch size {args.batch_size}")
+        reference = None
+        for workers in range(1, args.max_workers + 1):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                answers = [answer['answer'] for answer in answer_sharded(engine, examples, workers, args.threads)]
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if reference is None:
+                reference, reference_seconds = answers, best
+            identical = sum(answer == expected for answer, expected in zip(answers, reference))
+            threads = args.threads or default_threads(workers)
+            print(f"{workers:3d} workers x {threads} threads: {len(examples) / best:7.1f} questions/s "
+                  f"({reference_seconds / best:.2f}x), {identical / len(examples):.1%} identical to 1 worker")
@@ -0,0 +1,164 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fixtures import fixture_key, load_fixtures
+
+# Routes servies : /dblp/sparql, /semopenalex/sparql et /wikipedia/api.php?titles=A|B|C
+SPARQL_SERVICES = ("dblp", "semopenalex")
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    # Connexions persistantes, comme les vrais points d'accès ; sans Nagle, en-têtes et corps
+    # écrits séparément ajouteraient ~40 ms d'ACK retardé à chaque réponse
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, content_type="application/json"):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def begin_request(self):
+        # Latence et erreurs injectées ; False si la réponse 503 a déjà été envoyée
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency * random.uniform(1 - server.jitter, 1 + server.jitter))
+        with server.lock:
+            server.requests += 1
+            if random.random() < server.error_rate:
+                server.injected_errors += 1
+                inject_error = True
+            else:
+                inject_error = False
+        if inject_error:
+            self.send_json(503, {"error": "injected failure"})
+        return not inject_error
+
+    def find_fixture(self, service, request):
+        fixture = self.server.fixtures.get((service, fixture_key(request)))
+        if fixture is None:
+            with self.server.lock:
+                self.server.missing += 1
+        return fixture
+
+    def replay(self, service, request):
+        if not self.begin_request():
+            return
+        fixture = self.find_fixture(service, request)
+        if fixture is None:
+            self.send_json(404, {"error": f"no {service} fixture for this request"})
+        else:
+            self.send_json(fixture["status"], fixture["response"], "application/sparql-results+json")
+
+    def replay_wikipedia(self, titles):
+        # Réponse action=query (formatversion=2) assemblée à partir des fixtures enregistrées par titre
+        if not self.begin_request():
+            return
+        pages = []
+        for title in titles.split("|"):
+            fixture = self.find_fixture("wikipedia", title)
+            if fixture is None or fixture["response"] is None:
+                pages.append({"title": title, "missing": True})
+            else:
+                pages.append({"title": title, "extract": fixture["response"]})
+        self.send_json(200, {"batchcomplete": True, "query": {"pages": pages}})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        service = url.path.strip("/").split("/")[0]
+        if service == "wikipedia" and "titles" in params:
+            self.replay_wikipedia(params["titles"][0])
+        elif service in SPARQL_SERVICES and "query" in params:
+            self.replay(service, params["query"][0])
+        else:
+            self.send_json(400, {"error": "unsupported request"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        service = url.path.strip("/").split("/")[0]
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode('utf-8')
+        # Protocole SPARQL : requête en formulaire (query=...) ou brute (application/sparql-query)
+        if self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+            query = body
+        else:
+            query = parse_qs(body).get("query", [None])[0]
+        if service in SPARQL_SERVICES and query:
+            self.replay(service, query)
+        else:
+            self.send_json(400, {"error": "unsupported request"})
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Local stand-in for DBLP, SemOpenAlex and Wikipedia serving recorded fixtures."""
+
+    daemon_threads = True
+
+    def __init__(self, fixture_dir, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, verbose=False):
+        super().__init__((host, port), ReplayHandler)
+        self.fixtures = load_fixtures(fixture_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.missing = 0
+        self.injected_errors = 0
+        if seed is not None:
+            random.seed(seed)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        # Variables à exporter pour que les scripts du pipeline visent ce serveur
+        return {
+            "QALD_DBLP_ENDPOINT": f"{self.base_url}/dblp/sparql",
+            "QALD_SEMOPENALEX_ENDPOINT": f"{self.base_url}/semopenalex/sparql",
+            "QALD_WIKIPEDIA_ENDPOINT": f"{self.base_url}/wikipedia/api.php",
+        }
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded DBLP/SemOpenAlex/Wikipedia fixtures over HTTP.")
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8890)
+    parser.add_argument("--latency", type=float, default=0.0, help="injected latency per request, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative latency jitter, e.g. 0.5 for +/-50%%")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixture_dir, args.host, args.port, args.latency, args.jitter, args.error_rate, args.seed, args.verbose)
+    print(f"Serving {len(server.fixtures)} fixtures on {server.base_url}")
+    for name, value in server.environment().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
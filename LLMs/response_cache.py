@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Cache disque partagé par extractcontext.py et llm_bert.py
+DEFAULT_CACHE_PATH = os.environ.get("QALD_CACHE_PATH", "response_cache.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600        # réponses positives : 30 jours
+DEFAULT_NEGATIVE_TTL = 24 * 3600    # "no bindings", absences DBLP / Wikipedia : 1 jour
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+EVICTION_INTERVAL = 64              # vérifier la taille toutes les N écritures
+
+
+def normalize_query(query):
+    # Deux requêtes qui ne diffèrent que par l'indentation partagent la même entrée
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with per-entry TTL and LRU eviction.
+
+    Entries are keyed by namespace (the endpoint URL, or "wikipedia#intro") plus the
+    normalized request text. Negative entries record a miss so it is not asked
+    again before negative_ttl expires.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                negative INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(namespace, request):
+        payload = f"{namespace}\n{normalize_query(request)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, namespace, request):
+        """Return (hit, value); expired entries count as misses."""
+        key = self.make_key(namespace, request)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return False, None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return True, json.loads(row[0])
+
+    def set(self, namespace, request, value, negative=False, ttl=None):
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        key = self.make_key(namespace, request)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, negative, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(value, ensure_ascii=False), int(negative), now + ttl, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICTION_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now):
+        # Purger les entrées expirées puis les moins récemment lues jusqu'à repasser sous max_bytes
+        self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            stale = []
+            for key, size in self._conn.execute("SELECT key, LENGTH(value) FROM entries ORDER BY last_access"):
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
@@ -0,0 +1,212 @@
+import contextlib
+import email.utils
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fixtures import record_fixture
+from response_cache import get_response_cache
+
+# Les variables d'environnement permettent de viser le serveur de rejeu (replay_server.py)
+DBLP_ENDPOINT = os.environ.get("QALD_DBLP_ENDPOINT", "https://dblp-april24.skynet.coypu.org/sparql")
+SEMOPENALEX_ENDPOINT = os.environ.get("QALD_SEMOPENALEX_ENDPOINT", "https://semoa.skynet.coypu.org/sparql")
+# API MediaWiki (action=query), interrogée par lots de titres
+WIKIPEDIA_ENDPOINT = os.environ.get("QALD_WIKIPEDIA_ENDPOINT", "https://en.wikipedia.org/w/api.php")
+# Wikimedia demande un User-Agent identifiant le client
+WIKIPEDIA_USER_AGENT = "QALD-Fin/1.0 (https://github.com/FOMUBAD-BORISTA-FONDI/QALD-Fin) python-requests"
+
+# Service associé à chaque point d'accès (clé passée à request_slot et nom des fixtures)
+ENDPOINT_SERVICES = {
+    DBLP_ENDPOINT: "dblp",
+    SEMOPENALEX_ENDPOINT: "semopenalex",
+    WIKIPEDIA_ENDPOINT: "wikipedia",
+}
+
+DEFAULT_TIMEOUT = (10, 120)   # (connexion, lecture) en secondes
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+DEFAULT_POOL_SIZE = 16
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_request_gate = None
+
+
+def set_request_gate(gate):
+    """Install a callable(service) returning a context manager held around each network request.
+
+    The concurrent mode of extractcontext.py uses it to apply per-endpoint
+    concurrency and rate limits to real requests only, not to cache hits.
+    """
+    global _request_gate
+    _request_gate = gate
+
+
+def request_slot(service):
+    if _request_gate is None:
+        return contextlib.nullcontext()
+    return _request_gate(service)
+
+
+def parse_retry_after(value):
+    # Retry-After est soit un nombre de secondes, soit une date HTTP
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class SparqlClient:
+    """Pooled keep-alive sessions (one per endpoint) with timeouts and jittered retries."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, pool_size=DEFAULT_POOL_SIZE):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._sessions = {}
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, endpoint):
+        with self._lock:
+            session = self._sessions.get(endpoint)
+            if session is None:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[endpoint] = session
+                self._adapters[endpoint] = adapter
+            return session
+
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # "Full jitter" : délai aléatoire entre 0 et la borne exponentielle
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method, url, service=None, **kwargs):
+        """Send a request, retrying connection errors, 429 and 5xx. Returns the last response."""
+        session = self.session_for(url)
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                self.requests += 1
+            try:
+                with request_slot(service or url):
+                    response = session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise
+                delay = self.backoff_delay(attempt)
+                print(f"Request to {url} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    # 404 est une absence (page Wikipedia rejouée), pas un échec
+                    if response.status_code >= 400 and response.status_code != 404:
+                        with self._lock:
+                            self.failures += 1
+                    return response
+                delay = self.backoff_delay(attempt, parse_retry_after(response.headers.get('Retry-After')))
+                print(f"{url} answered {response.status_code}, retrying in {delay:.1f}s")
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+
+    def post(self, endpoint, query, service=None):
+        return self.request("POST", endpoint, service, data={'query': query},
+                            headers={'Accept': 'application/sparql-results+json'})
+
+    def get(self, url, params=None, service=None, headers=None):
+        return self.request("GET", url, service, params=params, headers={'Accept': 'application/json', **(headers or {})})
+
+    def metrics(self):
+        """Request counters plus connection reuse, read from the urllib3 pools."""
+        connections = 0
+        pooled_requests = 0
+        with self._lock:
+            adapters = list(self._adapters.values())
+            metrics = {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+        for adapter in adapters:
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools[key]
+                connections += pool.num_connections
+                pooled_requests += pool.num_requests
+        metrics["connections_opened"] = connections
+        metrics["connection_reuse"] = 1 - connections / pooled_requests if pooled_requests else 0.0
+        return metrics
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._adapters.clear()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_sparql_client():
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = SparqlClient()
+    return _default_client
+
+
+def print_sparql_metrics():
+    metrics = get_sparql_client().metrics()
+    print(
+        f"SPARQL: {metrics['requests']} requests, {metrics['retries']} retries, {metrics['failures']} failures, "
+        f"{metrics['connections_opened']} connections opened ({metrics['connection_reuse']:.0%} reuse)"
+    )
+
+
+def post_sparql(endpoint, query, use_cache=True):
+    """POST a SPARQL SELECT, going through the response cache by default.
+
+    Returns (status_code, results), or (None, None) when a 200 response is not
+    JSON. Only 200 JSON responses are stored; results without bindings are
+    stored as negative entries. Batched fetchers that
+    cache per entity pass use_cache=False.
+    """
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        hit, results = cache.get(endpoint, query)
+        if hit:
+            return 200, results
+
+    response = get_sparql_client().post(endpoint, query)
+    if response.status_code != 200:
+        return response.status_code, None
+
+    try:
+        results = response.json()
+    except ValueError:
+        # Page de maintenance ou autre corps non JSON servi avec un 200 : échec de la requête, rien en cache
+        print(f"Non-JSON response from {endpoint} ({response.headers.get('Content-Type', 'no content type')})")
+        return None, None
+    record_fixture(ENDPOINT_SERVICES.get(endpoint, endpoint), query, results)
+    if cache is not None:
+        cache.set(endpoint, query, results, negative=not results['results']['bindings'])
+    return 200, results
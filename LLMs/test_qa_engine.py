@@ -0,0 +1,35 @@
+"""QAEngine against the transformers question-answering pipeline it replaces, on a small random BERT.
+
+    python -m pytest test_qa_engine.py
+"""
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from qa_engine import QAEngine
+from qa_parity import build_tiny_model, load_examples
+
+QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "processed_sch_set2_test_questions.json")
+QUESTION_LIMIT = 120
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    _, examples = load_examples(QUESTIONS, QUESTION_LIMIT)
+    model, tokenizer = build_tiny_model(str(tmp_path_factory.mktemp("tiny-bert")), [text for example in examples for text in example])
+    return model, tokenizer, examples
+
+
+def test_engine_matches_pipeline(tiny_model):
+    model, tokenizer, examples = tiny_model
+    qa_pipeline = transformers.pipeline("question-answering", model=model, tokenizer=tokenizer)
+    answers = QAEngine.from_model(model, tokenizer).answer_batch(examples)
+    # Des contextes plus longs qu'un segment : la fusion entre segments est aussi comparée
+    assert any(len(tokenizer(question, context)["input_ids"]) > 384 for question, context in examples)
+    for (question, context), answer in zip(examples, answers):
+        expected = qa_pipeline(question=question, context=context)
+        assert (answer["answer"], answer["start"], answer["end"]) == (expected["answer"], expected["start"], expected["end"])
+        assert answer["score"] == pytest.approx(expected["score"], rel=1e-5)
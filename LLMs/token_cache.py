@@ -0,0 +1,144 @@
+"""Disk cache of the tokenized question/context pairs of QAEngine.
+
+QAEngine.encode() turns (question, context) pairs into flat token arrays:
+input ids, token types, character offsets, word and sequence ids, and one row
+(pair index, first token, length) per doc-stride window. TokenCache stores
+them as .npy files, read back memory-mapped, so a rerun or a parameter sweep
+gets its features without calling the tokenizer:
+
+    <cache>/<tokenizer fingerprint>/<content hash>/input_ids.npy ... features.npy, pairs.json
+
+The fingerprint covers the tokenizer (vocabulary, normalizer, special tokens)
+and the windowing settings; the content hash covers the pairs of the entry.
+Pairs are looked up one by one, so the questions llm_bert.py defers to the
+model are found in an entry prepared for the whole test set:
+
+    python token_cache.py processed_sch_set2_test_questions.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+FORMAT = "qald-tokens/1"
+ARRAYS = ("input_ids", "token_type_ids", "offsets", "word_ids", "sequence_ids", "features")
+
+
+def tokenizer_fingerprint(tokenizer, settings):
+    """Hash of everything the token arrays depend on besides the text."""
+    digest = hashlib.sha256(FORMAT.encode())
+    # Tokenizer rapide : sa sérialisation (vocabulaire, normalisation, gabarit des paires), sans la
+    # troncature et le remplissage que chaque appel réécrit ; ceux de QAEngine sont dans settings
+    serialized = json.loads(tokenizer.backend_tokenizer.to_str())
+    serialized.pop('truncation', None)
+    serialized.pop('padding', None)
+    digest.update(json.dumps(serialized, sort_keys=True).encode('utf-8'))
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def pair_hash(question, context):
+    return hashlib.sha256(json.dumps([question, context], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    """Memory-mapped token arrays of one tokenizer fingerprint, indexed by question/context pair."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pairs = {}  # hash de la paire -> [(index de la paire dans l'entrée, feature)]
+        self.hits = 0
+        self.misses = 0
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(".tmp"):
+                    self.open_entry(os.path.join(directory, name))
+
+    def open_entry(self, path):
+        from qa_engine import split_features
+
+        try:
+            with open(os.path.join(path, "pairs.json"), 'r', encoding='utf-8') as f:
+                hashes = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable token cache entry {path}: {e}")
+            return
+        by_pair = [[] for _ in hashes]
+        for pair_index, feature in split_features(arrays):
+            by_pair[pair_index].append(feature)
+        for digest, features in zip(hashes, by_pair):
+            self.pairs.setdefault(digest, features)
+
+    def store(self, hashes, arrays):
+        # Entrée écrite à côté puis renommée : une lecture ne voit jamais une entrée incomplète
+        content_hash = hashlib.sha256("".join(hashes).encode()).hexdigest()[:16]
+        path = os.path.join(self.directory, content_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), arrays[name])
+        with open(os.path.join(tmp_path, "pairs.json"), 'w', encoding='utf-8') as f:
+            json.dump(hashes, f)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Même entrée déjà écrite par un autre processus
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.open_entry(path)
+
+    def features(self, examples, encode):
+        """(example_index, feature) pairs of examples; pairs not in the cache are encoded and stored first."""
+        hashes = [pair_hash(question, context) for question, context in examples]
+        missing = list(dict.fromkeys(digest for digest in hashes if digest not in self.pairs))
+        if missing:
+            positions = {digest: position for position, digest in reversed(list(enumerate(hashes)))}
+            self.store(missing, encode([examples[positions[digest]] for digest in missing]))
+        self.misses += len(missing)
+        self.hits += len(hashes) - len(missing)
+        return [(example_index, feature) for example_index, digest in enumerate(hashes) for feature in self.pairs[digest]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokenize every question/context pair of the test set into the token cache.")
+    parser.add_argument("questions_file", help="processed questions (rendered list or entity table)")
+    parser.add_argument("--tokenizer", help="tokenizer directory or hub name (default: the QA model)")
+    parser.add_argument("--full-context", action="store_true", help="cache the unpruned contexts (QALD_PRUNE_CONTEXT=0)")
+    args = parser.parse_args()
+
+    from context_pruning import prune_context
+    from entity_table import open_processed_questions
+    from intent_router import route_question
+    from qa_engine import QAEngine
+    from qa_model import QA_MODEL_NAME, TOKEN_CACHE_DIR, has_model_cache, model_cache_path
+    from transformers import AutoTokenizer
+
+    tokenizer_source = args.tokenizer or (model_cache_path(QA_MODEL_NAME) if has_model_cache(model_cache_path(QA_MODEL_NAME)) else QA_MODEL_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_source)
+
+    # Les paires que llm_bert.py donnerait au modèle si aucune question n'avait de réponse structurée
+    processed = open_processed_questions(args.questions_file)
+    examples = []
+    for question in processed.questions:
+        context = processed.context(question)
+        if question.get('question') and context:
+            if not args.full_context:
+                context = prune_context(context, route_question(question['question']))
+            examples.append((question['question'], context))
+
+    start = time.perf_counter()
+    encoded = QAEngine(tokenizer, None).encode(examples)
+    encode_seconds = time.perf_counter() - start
+    engine = QAEngine(tokenizer, None, token_cache_dir=TOKEN_CACHE_DIR)
+    engine.featurize(examples)
+
+    start = time.perf_counter()
+    features = QAEngine(tokenizer, None, token_cache_dir=TOKEN_CACHE_DIR).featurize(examples)
+    cached_seconds = time.perf_counter() - start
+    print(f"{len(examples)} pairs, {len(features)} windows, {len(encoded['input_ids'])} tokens in {engine.token_cache.directory}")
+    print(f"tokenizer {encode_seconds:.3f}s, token cache {cached_seconds:.3f}s ({encode_seconds / cached_seconds:.1f}x)")
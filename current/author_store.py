@@ -0,0 +1,133 @@
+"""Typed, normalized Parquet store of author_institution_info.csv.
+
+The CSV repeats the author and institution fields (and the long Wikipedia text)
+on every question row, writes missing metrics as "Unknown" and the author names
+as a stringified Python list. build_store() splits it into three tables that
+keep the column names of the CSV:
+
+    questions     id, Question, Associated_author_uri, author_id (one row per author record of a question)
+    authors       author_id, Associated_author_uri, author_name, author_names, hindex, i10index,
+                  citedByCount, worksCount, 2YrMeanCitedness, memberOf, wikipedia_text
+    institutions  memberOf, institution_name, institution_country, institution_acronym,
+                  institution_type, institution_citedByCount, institution_worksCount
+
+A DBLP author matched to several SemOpenAlex records keeps one authors row per
+record. Metrics are nullable Int64/Float64, missing values are nulls. load_table()
+memory-maps a table and reads only the requested columns:
+
+    python author_store.py
+    load_table("authors", ["Associated_author_uri", "hindex"])
+
+pyarrow is only needed by the functions that read or write Parquet.
+"""
+import argparse
+import ast
+import os
+
+import pandas as pd
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "author_institution_store")
+TABLES = ("questions", "authors", "institutions")
+
+AUTHOR_INT_COLUMNS = ["hindex", "i10index", "citedByCount", "worksCount"]
+AUTHOR_RECORD_COLUMNS = AUTHOR_INT_COLUMNS + ["2YrMeanCitedness", "memberOf"]
+INSTITUTION_INT_COLUMNS = ["institution_citedByCount", "institution_worksCount"]
+INSTITUTION_STRING_COLUMNS = ["institution_name", "institution_country", "institution_acronym", "institution_type"]
+
+
+def missing_as_null(series, sentinel="Unknown"):
+    return series.mask(series == sentinel)
+
+
+def parse_author_names(value):
+    # "['Anuradha M. Annaswamy', 'Anuradha Annaswamy']" -> liste ; une valeur qui n'est pas une liste reste un nom
+    try:
+        names = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return [value]
+    return [str(name) for name in names] if isinstance(names, (list, tuple)) else [str(names)]
+
+
+def normalize(df):
+    """(questions, authors, institutions) DataFrames from the rows of author_institution_info.csv."""
+    rows = pd.DataFrame({
+        "id": df["id"].astype("string"),
+        "Question": df["Question"].astype("string"),
+        "Associated_author_uri": df["Associated_author_uri"].astype("string"),
+    })
+    author_names = df["author_name"].map(parse_author_names)
+    rows["author_name"] = author_names.map(lambda names: names[0] if names else None).astype("string")
+    rows["author_names"] = author_names
+    for column in AUTHOR_INT_COLUMNS:
+        rows[column] = missing_as_null(df[column]).astype("Int64")
+    # Conversion directe en Float64 : pd.to_numeric arrondit parfois le dernier chiffre
+    rows["2YrMeanCitedness"] = missing_as_null(df["2YrMeanCitedness"]).astype("Float64")
+    rows["memberOf"] = missing_as_null(df["memberOf"]).astype("string")
+    rows["wikipedia_text"] = missing_as_null(df["wikipedia_text"], "No Wikipedia text found").astype("string")
+
+    # Un auteur DBLP peut correspondre à plusieurs fiches SemOpenAlex (homonymes) : une fiche par jeu de
+    # métriques ; les lignes sans aucune métrique ne comptent que si l'auteur n'a pas d'autre fiche
+    known = rows[AUTHOR_RECORD_COLUMNS].notna().any(axis=1)
+    rows = rows[known | ~known.groupby(rows["Associated_author_uri"]).transform("any")]
+    rows = rows.assign(author_id=rows.groupby(["Associated_author_uri"] + AUTHOR_RECORD_COLUMNS, sort=False, dropna=False).ngroup())
+
+    questions = rows[["id", "Question", "Associated_author_uri", "author_id"]].drop_duplicates(["id", "author_id"], ignore_index=True)
+    # Texte Wikipedia trouvé pour une question et pas pour l'autre : première valeur connue
+    authors = rows.drop(columns=["id", "Question"]).groupby("author_id", sort=True).first().reset_index()
+
+    institutions = pd.DataFrame({"memberOf": missing_as_null(df["memberOf"]).astype("string")})
+    for column in INSTITUTION_STRING_COLUMNS:
+        institutions[column] = missing_as_null(df[column]).astype("string")
+    for column in INSTITUTION_INT_COLUMNS:
+        institutions[column] = missing_as_null(df[column]).astype("Int64")
+    institutions = institutions.dropna(subset=["memberOf"]).groupby("memberOf", sort=False).first().reset_index()
+    return questions, authors, institutions
+
+
+def build_store(csv_path, directory=DEFAULT_STORE_DIR):
+    """Write the three tables of csv_path as Parquet files in directory; returns their paths."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Lu en texte : les sentinelles sont remplacées par des nulls avant la conversion en nombres
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name, table in zip(TABLES, normalize(df)):
+        path = os.path.join(directory, f"{name}.parquet")
+        tmp_path = f"{path}.tmp"
+        pq.write_table(pa.Table.from_pandas(table, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+        paths[name] = path
+    return paths
+
+
+def load_table(name, columns=None, directory=DEFAULT_STORE_DIR):
+    """Table `name` of the store as a DataFrame with nullable dtypes, memory-mapped, restricted to columns."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(os.path.join(directory, f"{name}.parquet"), columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def load_rows(columns=None, directory=DEFAULT_STORE_DIR):
+    """Rows of the CSV rebuilt by joining the tables (typed), restricted to columns when given."""
+    questions = load_table("questions", directory=directory)
+    authors = load_table("authors", directory=directory)
+    institutions = load_table("institutions", directory=directory)
+    rows = questions.merge(authors.drop(columns=["Associated_author_uri"]), on="author_id", how="left")
+    rows = rows.merge(institutions, on="memberOf", how="left")
+    return rows[columns] if columns else rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the normalized Parquet store of author_institution_info.csv.")
+    parser.add_argument("--input", default="author_institution_info.csv")
+    parser.add_argument("--output-dir", default=DEFAULT_STORE_DIR)
+    args = parser.parse_args()
+
+    paths = build_store(args.input, args.output_dir)
+    for name, path in paths.items():
+        table = load_table(name, directory=args.output_dir)
+        print(f"{name}: {len(table)} rows, {os.path.getsize(path) / 1024:.0f} KB")
+    print(f"{args.input}: {os.path.getsize(args.input) / 1024:.0f} KB")
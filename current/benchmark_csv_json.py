@@ -0,0 +1,106 @@
+import argparse
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from csv_json import FIELDS, convert, convert_iterrows
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def synthetic_input(df, scale):
+    # `scale` copies du CSV, identifiants suffixés par le numéro de copie : scale fois plus de questions
+    copies = []
+    for copy in range(scale):
+        chunk = df.copy()
+        chunk['id'] = chunk['id'] + f"-{copy}"
+        copies.append(chunk)
+    return pd.concat(copies, ignore_index=True)
+
+
+def write_synthetic_csv(df, scale, path):
+    # Copie par copie : le CSV synthétique n'est jamais entier en mémoire
+    for copy in range(scale):
+        chunk = df.copy()
+        chunk['id'] = chunk['id'] + f"-{copy}"
+        chunk.to_csv(path, mode='w' if copy == 0 else 'a', header=copy == 0, index=False)
+
+
+def numbers_only(df, rows=20):
+    # Lignes sans aucune sentinelle : les colonnes de métriques y sont lues comme des nombres
+    known = pd.Series(True, index=df.index)
+    for column, _, sentinel in FIELDS:
+        if sentinel is not None:
+            known &= df[column] != sentinel
+    return df[known].head(rows)
+
+
+def check_numbers_only(df, directory, chunksize=7):
+    """Compare the JSON of the in-memory, --stream and --iterrows conversions of a numbers-only CSV."""
+    csv_path = os.path.join(directory, "numbers.csv")
+    numbers_only(df).to_csv(csv_path, index=False)
+    outputs = []
+    for mode, arguments in (("memory", []), ("stream", ["--stream", "--chunksize", str(chunksize)]), ("iterrows", ["--iterrows"])):
+        outputs.append(os.path.join(directory, f"numbers-{mode}.json"))
+        run_measured(["--input", csv_path, "--output", outputs[-1]] + arguments)
+    identical = all(filecmp.cmp(outputs[0], output, shallow=False) for output in outputs[1:])
+    return f"numbers-only input: {'identical' if identical else 'DIFFERENT'} JSON in memory, --stream and --iterrows"
+
+
+def timed(function, df):
+    start = time.perf_counter()
+    data = function(df)
+    return data, time.perf_counter() - start
+
+
+def run_measured(arguments):
+    # Durée et pic de mémoire résidente (Mo) d'une conversion dans un processus à part
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(CURRENT_DIR, "csv_json.py")] + arguments, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise SystemExit(f"csv_json.py {' '.join(arguments)} failed")
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the CSV to JSON conversion on synthetic inputs.")
+    parser.add_argument("--input", default='author_institution_info.csv')
+    parser.add_argument("--scale", type=int, action="append", help="input size as a multiple of the CSV (repeatable, default: 1, 100, 1000)")
+    parser.add_argument("--iterrows-up-to", type=int, default=100, help="largest scale also converted row by row")
+    parser.add_argument("--stream", action="store_true", help="compare time and peak memory of the in-memory and --stream conversions")
+    parser.add_argument("--in-memory-up-to", type=int, default=100, help="largest scale also converted in memory with --stream")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    if args.stream:
+        with tempfile.TemporaryDirectory() as directory:
+            print(check_numbers_only(df, directory))
+    for scale in args.scale or [1, 100, 1000]:
+        if args.stream:
+            with tempfile.TemporaryDirectory() as directory:
+                csv_path = os.path.join(directory, "input.csv")
+                write_synthetic_csv(df, scale, csv_path)
+                seconds, peak = run_measured(["--input", csv_path, "--output", os.path.join(directory, "stream.json"), "--stream"])
+                line = f"{scale:5d}x ({os.path.getsize(csv_path) / 2**20:.0f} MB): stream {seconds:.1f}s, {peak:.0f} MB peak"
+                if scale <= args.in_memory_up_to:
+                    seconds, peak = run_measured(["--input", csv_path, "--output", os.path.join(directory, "memory.json")])
+                    identical = filecmp.cmp(os.path.join(directory, "stream.json"), os.path.join(directory, "memory.json"), shallow=False)
+                    line += f"; in memory {seconds:.1f}s, {peak:.0f} MB peak, {'identical' if identical else 'DIFFERENT'} JSON"
+            print(line)
+            continue
+
+        synthetic = synthetic_input(df, scale) if scale > 1 else df
+        data, seconds = timed(convert, synthetic)
+        line = f"{scale:5d}x ({len(synthetic)} rows, {len(data)} ids): groupby {seconds:.2f}s"
+        if scale <= args.iterrows_up_to:
+            reference, reference_seconds = timed(convert_iterrows, synthetic)
+            identical = json.dumps(data, indent=4) == json.dumps(reference, indent=4)
+            line += f", iterrows {reference_seconds:.2f}s ({reference_seconds / seconds:.1f}x), {'identical' if identical else 'DIFFERENT'} JSON"
+        print(line)
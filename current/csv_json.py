@@ -1,115 +1,208 @@
-import pandas as pd
+import argparse
 import json
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
 
-# Load the CSV data into a DataFrame
-df = pd.read_csv('author_institution_info.csv')
-
-# Initialize an empty dictionary to store the JSON data
-data = {}
-
-# Iterate through each row in the DataFrame
-for _, row in df.iterrows():
-    # Extract the unique ID
-    unique_id = row['id']
-    
-    # Initialize a dictionary for the current ID
-    if unique_id not in data:
-        data[unique_id] = {
-            "question": [],
-            "Associated_author_uri": [],
-            "id": [],
-            "author_name": [],
-            "hindex": [],
-            "i10index": [],
-            "citedByCount": [],
-            "worksCount": [],
-            "2YrMeanCitedness": [],
-            "memberOf": [],
-            "institution_name": [],
-            "institution_country": [],
-            "institution_type": [],
-            "institution_acronym": [],
-            "institution_citedByCount": [],
-            "institution_worksCount": [],
-            "wikipedia_text": []
-        }
-    
-    # Append each field to the appropriate list in the dictionary
-    if row["Question"] not in data[unique_id]["question"]:
-        data[unique_id]["question"].append(row["Question"])
-
-    if row["Associated_author_uri"] not in data[unique_id]["Associated_author_uri"]:
-        data[unique_id]["Associated_author_uri"].append(row["Associated_author_uri"])
-    
-    if row["id"] not in data[unique_id]["id"]:
-        data[unique_id]["id"].append(row["id"])
-
-    if row["author_name"] not in data[unique_id]["author_name"]:
-        data[unique_id]["author_name"].append(row["author_name"])
-
-    if (row["hindex"] not in data[unique_id]["hindex"]) & (row["hindex"] != "Unknown"):
-        data[unique_id]["hindex"].append(row["hindex"])
-
-    if (row["i10index"] not in data[unique_id]["i10index"]) & (row["i10index"] != "Unknown"):
-        data[unique_id]["i10index"].append(row["i10index"])
-
-    if (row["citedByCount"] not in data[unique_id]["citedByCount"]) & (row["citedByCount"] != "Unknown"):
-        data[unique_id]["citedByCount"].append(row["citedByCount"])
-    
-    if (row["worksCount"] not in data[unique_id]["worksCount"]) & (row["worksCount"] != "Unknown"):
-        data[unique_id]["worksCount"].append(row["worksCount"])
-
-    if (row["2YrMeanCitedness"] not in data[unique_id]["2YrMeanCitedness"]) & (row["2YrMeanCitedness"] != "Unknown"):
-        data[unique_id]["2YrMeanCitedness"].append(row["2YrMeanCitedness"])
-
-    if (row["memberOf"] not in data[unique_id]["memberOf"]) & (row["memberOf"] != "Unknown"):
-        data[unique_id]["memberOf"].append(row["memberOf"])
-    
-    if (row["institution_name"] not in data[unique_id]["institution_name"]) & (row["institution_name"] != "Unknown"):
-        data[unique_id]["institution_name"].append(row["institution_name"])
-
-    if (row["institution_country"] not in data[unique_id]["institution_country"]) & (row["institution_country"] != "Unknown"):
-        data[unique_id]["institution_country"].append(row["institution_country"])
-
-    if (row["institution_type"] not in data[unique_id]["institution_type"]) & (row["institution_type"] != "Unknown"):
-        data[unique_id]["institution_type"].append(row["institution_type"])
-    
-    if (row["institution_acronym"] not in data[unique_id]["institution_acronym"]) & (row["institution_acronym"] != "Unknown"):
-        data[unique_id]["institution_acronym"].append(row["institution_acronym"])
-
-    if (row["institution_citedByCount"] not in data[unique_id]["institution_citedByCount"]) & (row["institution_citedByCount"] != "Unknown"):
-        data[unique_id]["institution_citedByCount"].append(row["institution_citedByCount"])
-
-    if (row["institution_worksCount"] not in data[unique_id]["institution_worksCount"]) & (row["institution_worksCount"] != "Unknown"):
-        data[unique_id]["institution_worksCount"].append(row["institution_worksCount"])
-
-    if (row["wikipedia_text"] not in data[unique_id]["wikipedia_text"]) & (row["wikipedia_text"] != "No Wikipedia text found") :
-        data[unique_id]["wikipedia_text"].append(row["wikipedia_text"])
-    # data[unique_id]["id"].append(row["id"])
-    # data[unique_id]["id"].append(row["id"])
-    # data[unique_id]["author_name"].append(row["author_name"])
-    # data[unique_id]["hindex"].append(row["hindex"])
-    # data[unique_id]["i10index"].append(row["i10index"])
-    # data[unique_id]["citedByCount"].append(row["citedByCount"])
-    # data[unique_id]["worksCount"].append(row["worksCount"])
-    # data[unique_id]["2YrMeanCitedness"].append(row["2YrMeanCitedness"])
-    # data[unique_id]["memberOf"].append(row["memberOf"])
-    # data[unique_id]["institution_name"].append(row["institution_name"])
-    # data[unique_id]["institution_country"].append(row["institution_country"])
-    # data[unique_id]["institution_type"].append(row["institution_type"])
-    # data[unique_id]["institution_citedByCount"].append(row["institution_citedByCount"])
-    # data[unique_id]["institution_worksCount"].append(row["institution_worksCount"])
-    # data[unique_id]["wikipedia_text"].append(row["wikipedia_text"])
-
-# Write the JSON data to a file
-with open('author_institution_info.json', 'w') as json_file:
-    json.dump(data, json_file, indent=4)
-
-# Charger le contenu du fichier JSON dans la variable dict_question
-# with open('author_institution_info.json', 'r') as file:
-#     dict_question = json.load(file)
-
-# # Vérifier le contenu de dict_question
-# print(dict_question["6aa5cd8d-5c97-4c55-94b3-f3253440f731"])
-
-print("CSV data has been successfully converted to JSON format.")
+# (colonne du CSV, clé du JSON, valeur sentinelle à écarter), dans l'ordre des clés du JSON
+FIELDS = [
+    ("Question", "question", None),
+    ("Associated_author_uri", "Associated_author_uri", None),
+    ("id", "id", None),
+    ("author_name", "author_name", None),
+    ("hindex", "hindex", "Unknown"),
+    ("i10index", "i10index", "Unknown"),
+    ("citedByCount", "citedByCount", "Unknown"),
+    ("worksCount", "worksCount", "Unknown"),
+    ("2YrMeanCitedness", "2YrMeanCitedness", "Unknown"),
+    ("memberOf", "memberOf", "Unknown"),
+    ("institution_name", "institution_name", "Unknown"),
+    ("institution_country", "institution_country", "Unknown"),
+    ("institution_type", "institution_type", "Unknown"),
+    ("institution_acronym", "institution_acronym", "Unknown"),
+    ("institution_citedByCount", "institution_citedByCount", "Unknown"),
+    ("institution_worksCount", "institution_worksCount", "Unknown"),
+    ("wikipedia_text", "wikipedia_text", "No Wikipedia text found"),
+]
+
+# Lignes lues à la fois en mode --stream : la mémoire ne dépend que de cette taille
+STREAM_CHUNK_ROWS = 10000
+
+
+def merge_dtype(dtypes):
+    # Type d'une colonne sur tout le fichier à partir de ses types par morceau
+    if all(pd.api.types.is_integer_dtype(dtype) for dtype in dtypes):
+        return 'int64'
+    if all(pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype) for dtype in dtypes):
+        return 'float64'
+    if all(pd.api.types.is_bool_dtype(dtype) for dtype in dtypes):
+        return 'bool'
+    return str
+
+
+def column_dtypes(input_path, chunksize=STREAM_CHUNK_ROWS):
+    """{column: dtype} inferred over the whole CSV, read chunk by chunk.
+
+    A column is a number only if it is one in every chunk; any text makes the whole column text.
+    Both modes read the CSV with these types, so they write the same JSON values.
+    """
+    chunk_dtypes = {}
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        for column, dtype in chunk.dtypes.items():
+            chunk_dtypes.setdefault(column, []).append(dtype)
+    return {column: merge_dtype(dtypes) for column, dtypes in chunk_dtypes.items()}
+
+
+def read_csv(input_path):
+    """The whole CSV with the types of column_dtypes()."""
+    return pd.read_csv(input_path, dtype=column_dtypes(input_path))
+
+
+def convert(df):
+    """{id: {key: [distinct values in order of appearance]}}, without a Python loop over the rows."""
+    # Codes des identifiants dans l'ordre de première apparition
+    codes, ids = pd.factorize(df['id'])
+    ids = ids.tolist()
+    data = {unique_id: {key: [] for _, key, _ in FIELDS} for unique_id in ids}
+    for column, key, sentinel in FIELDS:
+        values = pd.DataFrame({'code': codes, 'value': df[column].to_numpy()})
+        if sentinel is not None:
+            values = values[values['value'] != sentinel]
+        # drop_duplicates garde la première occurrence : même ordre que les ajouts ligne par ligne
+        values = values.drop_duplicates()
+        # Tri stable par identifiant puis découpage aux changements de code : une liste par identifiant
+        order = np.argsort(values['code'].to_numpy(), kind='stable')
+        sorted_codes = values['code'].to_numpy()[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(sorted_codes) != 0]) if len(sorted_codes) else np.array([], dtype=np.int64)
+        sorted_values = values['value'].to_numpy()[order].tolist()
+        for code, start, end in zip(sorted_codes[starts].tolist(), starts.tolist(), starts[1:].tolist() + [len(sorted_values)]):
+            data[ids[code]][key] = sorted_values[start:end]
+    return data
+
+
+def convert_iterrows(df):
+    """Row by row conversion of the first version, kept as the reference of convert()."""
+    data = {}
+    for _, row in df.iterrows():
+        unique_id = row['id']
+        if unique_id not in data:
+            data[unique_id] = {key: [] for _, key, _ in FIELDS}
+        for column, key, sentinel in FIELDS:
+            if (row[column] not in data[unique_id][key]) & (row[column] != sentinel):
+                data[unique_id][key].append(row[column])
+    return data
+
+
+def spill_chunk(conn, chunk, first_row):
+    # Lignes du morceau rangées dans la base : identifiants à leur première ligne, valeurs distinctes par champ
+    rows = np.arange(first_row, first_row + len(chunk))
+    ids = chunk['id'].to_numpy()
+    first_seen = pd.DataFrame({'id': ids, 'row': rows}).drop_duplicates('id')
+    conn.executemany("INSERT OR IGNORE INTO ids (id, row) VALUES (?, ?)", zip(first_seen['id'].tolist(), first_seen['row'].tolist()))
+    for field, (column, _, sentinel) in enumerate(FIELDS):
+        values = pd.DataFrame({'id': ids, 'row': rows, 'value': chunk[column].to_numpy()})
+        if sentinel is not None:
+            values = values[values['value'] != sentinel]
+        values = values.drop_duplicates(['id', 'value'])
+        # Valeurs gardées sous leur forme JSON : c'est ce qui sera écrit
+        encoded = [json.dumps(value) for value in values['value'].tolist()]
+        conn.executemany(
+            "INSERT OR IGNORE INTO cells (id, field, row, value) VALUES (?, ?, ?, ?)",
+            zip(values['id'].tolist(), [field] * len(encoded), values['row'].tolist(), encoded)
+        )
+
+
+def write_json_stream(out, groups):
+    """Write {id: {key: [values]}} as json.dump(..., indent=4) would, one id at a time.
+
+    groups yields (encoded id, [(key, [encoded values])]) in output order.
+    """
+    out.write("{")
+    empty = True
+    for encoded_id, fields in groups:
+        out.write(("\n" if empty else ",\n") + "    " + encoded_id + ": {")
+        empty = False
+        for position, (key, values) in enumerate(fields):
+            out.write(("\n" if position == 0 else ",\n") + "        " + json.dumps(key) + ": ")
+            if values:
+                out.write("[\n" + ",\n".join("            " + value for value in values) + "\n        ]")
+            else:
+                out.write("[]")
+        out.write("\n    }")
+    out.write("}" if empty else "\n}")
+
+
+def stored_groups(conn):
+    # Identifiants dans l'ordre de première apparition, valeurs dans l'ordre des lignes ; la colonne id
+    # n'a pas de sentinelle, chaque identifiant a donc au moins une cellule et la jointure n'en perd aucun
+    cells = conn.execute(
+        "SELECT ids.id, cells.field, cells.value FROM ids JOIN cells ON cells.id = ids.id ORDER BY ids.row, cells.field, cells.row"
+    )
+    current_id, fields = None, None
+    for unique_id, field, value in cells:
+        if unique_id != current_id:
+            if current_id is not None:
+                yield json.dumps(current_id), [(key, fields[position]) for position, (_, key, _) in enumerate(FIELDS)]
+            current_id, fields = unique_id, [[] for _ in FIELDS]
+        fields[field].append(value)
+    if current_id is not None:
+        yield json.dumps(current_id), [(key, fields[position]) for position, (_, key, _) in enumerate(FIELDS)]
+
+
+def convert_stream(input_path, output_path, chunksize=STREAM_CHUNK_ROWS, spill_dir=None):
+    """Convert input_path to output_path in bounded memory, the rows grouped by id in an on-disk SQLite spill."""
+    spill = tempfile.NamedTemporaryFile(suffix=".sqlite3", dir=spill_dir, delete=False)
+    spill.close()
+    try:
+        conn = sqlite3.connect(spill.name)
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("CREATE TABLE ids (id TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE cells (id TEXT NOT NULL, field INTEGER NOT NULL, row INTEGER NOT NULL, value TEXT NOT NULL)")
+        # Première valeur d'un champ gardée, les suivantes identiques ignorées
+        conn.execute("CREATE UNIQUE INDEX cells_value ON cells (id, field, value)")
+        first_row = 0
+        # Types fixés sur tout le fichier : un morceau sans "Unknown" serait sinon lu comme des nombres
+        dtypes = column_dtypes(input_path, chunksize)
+        for chunk in pd.read_csv(input_path, chunksize=chunksize, dtype=dtypes):
+            spill_chunk(conn, chunk, first_row)
+            first_row += len(chunk)
+        conn.execute("CREATE INDEX ids_row ON ids (row)")
+        conn.execute("CREATE INDEX cells_order ON cells (id, field, row)")
+        conn.commit()
+
+        with open(output_path, 'w') as json_file:
+            write_json_stream(json_file, stored_groups(conn))
+        conn.close()
+    finally:
+        os.remove(spill.name)
+    return first_row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert author_institution_info.csv to the per-question JSON.")
+    parser.add_argument("--input", default='author_institution_info.csv')
+    parser.add_argument("--output", default='author_institution_info.json')
+    parser.add_argument("--iterrows", action="store_true", help="use the row by row conversion")
+    parser.add_argument("--stream", action="store_true", help="bounded memory: read the CSV in chunks, group the rows on disk")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNK_ROWS, help="rows per chunk in --stream mode")
+    parser.add_argument("--spill-dir", help="directory of the temporary grouping database in --stream mode")
+    args = parser.parse_args()
+
+    if args.stream:
+        rows = convert_stream(args.input, args.output, args.chunksize, args.spill_dir)
+        print(f"CSV data has been successfully converted to JSON format ({rows} rows streamed).")
+        raise SystemExit(0)
+
+    # Load the CSV data into a DataFrame
+    df = read_csv(args.input)
+    data = convert_iterrows(df) if args.iterrows else convert(df)
+
+    # Write the JSON data to a file
+    with open(args.output, 'w') as json_file:
+        json.dump(data, json_file, indent=4)
+
+    print("CSV data has been successfully converted to JSON format.")
@@ -2,6 +2,8 @@ import json
 import pandas as pd
 import os
 
+from json_index import JsonIndex
+
 # Directory containing the JSON files to process
 input_directory = '/home/borista/Desktop/test-data-breakdown/Authors vs institutions-break/'
 
@@ -16,9 +18,8 @@ file_names = [
     'institution/type/questions_with_type.json',
     'institution/works/questions_with_works.json'
     ]
-# Load the dictionary from the JSON file
-with open('/home/borista/Desktop/Schorlarly QALD/Code-Implementations/code/Tabular/results-1/current/author_institution_info.json', 'r') as file:
-    dict_question = json.load(file)
+# Index of the dictionary by question id: only the questions of the files are read
+dict_question = JsonIndex('/home/borista/Desktop/Schorlarly QALD/Code-Implementations/code/Tabular/results-1/current/author_institution_info.json')
 
 # Load the existing answers from the JSON file
 try:
@@ -39,6 +40,8 @@ for file_name in file_names:
     
     # Load the DataFrame from the JSON file
     df = pd.read_json(file_path)
+    # Entries of the questions of this file, read in one batch
+    entries = dict_question.get_many(df['id'])
 
     # Iterate over the rows of the DataFrame
     for _, row in df.iterrows():
@@ -51,10 +54,10 @@ for file_name in file_names:
         # Initialize the default answer as null
         answer_value = None
 
-        if unique_id in dict_question:
+        if unique_id in entries:
             # Check if there's an answer available for the current key
-            if dict_question[unique_id].get(row["key"]):
-                answer_value = dict_question[unique_id][row["key"]][0]
+            if entries[unique_id].get(row["key"]):
+                answer_value = entries[unique_id][row["key"]][0]
 
         # Append the new result to the new_answers list
         new_answers.append({
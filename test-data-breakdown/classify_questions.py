@@ -0,0 +1,190 @@
+"""Whole breakdown of the question set in one pass.
+
+Replaces the chain remove_list_uri.py, divide-author-institution-data.py, the
+per-metric scripts (hindex.py, i10index.py, 2yearsmean.py, citedBy.py,
+worksCount.py, acronym.py, type.py) and personal_questions_about_authors.py:
+the questions are read once, each question text is scanned once by a single
+compiled pattern holding the keywords of every script, and all the output files
+are written at the end. The keywords and their matching keep the semantics of
+the scripts (substring of the lowercased text, or whole words for citedBy and
+works), so the partitions are the same.
+
+    python classify_questions.py
+    python classify_questions.py --check
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+BREAKDOWN_DIR = os.path.dirname(os.path.abspath(__file__))
+SPLIT_DIR = "Authors vs institutions-break"
+
+LIST_URI_FILE = "remove_list_uri/list_author_dblp_uri_questions.json"
+NO_LIST_URI_FILE = "remove_list_uri/no_list_sch_set2_test_questions.json"
+SPLIT_FILES = {
+    "authors": f"{SPLIT_DIR}/authors/authors_questions.json",
+    "institution": f"{SPLIT_DIR}/institution/institutions_questions.json",
+}
+# Mots qui envoient une question du côté des institutions (divide-author-institution-data.py)
+INSTITUTION_KEYWORDS = ["organization", "institution", "affiliation", "affiliated", "institute"]
+
+# (partie, fichier de sortie, valeur du champ "key", mots-clés, mots entiers seulement)
+CATEGORIES = [
+    ("authors", f"{SPLIT_DIR}/authors/hIndex/questions_with_hindex.json", "hindex", ["hindex"], False),
+    ("authors", f"{SPLIT_DIR}/authors/i10index/questions_with_i10index.json", "i10index", ["i10index"], False),
+    ("authors", f"{SPLIT_DIR}/authors/2YearsMeanCitedness/questions_with_2yearsmean.json", "2YrMeanCitedness", ["two years"], False),
+    ("authors", f"{SPLIT_DIR}/authors/citedBy/questions_with_citations_citedBy.json", "citedByCount",
+     ["citations", "citedBy", "cited"], True),
+    ("authors", f"{SPLIT_DIR}/authors/works/questions_with_works.json", "worksCount",
+     ["works", "publications", "How many books has"], True),
+    ("institution", f"{SPLIT_DIR}/institution/acronym/questions_with_acronym.json", "acronym", ["short name"], False),
+    ("institution", f"{SPLIT_DIR}/institution/type/questions_with_type.json", "institution_type", ["type", "kind"], False),
+    ("institution", f"{SPLIT_DIR}/institution/citedBy/questions_with_citations_citedBy.json", "institution_citedByCount",
+     ["citations", "citedBy", "cited", "citation"], True),
+    ("institution", f"{SPLIT_DIR}/institution/works/questions_with_works.json", "institution_worksCount",
+     ["What is the number of publications", "works", "articles", "How many publications", "How many papers",
+      "What is the number of papers", "What is the number of scientific papers", "scientific publications"], True),
+]
+# Questions d'une partie sans aucune catégorie
+PERSONAL_FILES = {
+    "authors": (f"{SPLIT_DIR}/authors/personal_questions/personal_questions.json", None),
+    "institution": (f"{SPLIT_DIR}/institution/personal_questions/personal_questions.json", "wikipedia_text"),
+}
+
+# Corrections faites à la main dans les fichiers du dépôt après les scripts :
+# question ajoutée à une catégorie d'une autre partie, ou retirée d'une catégorie trouvée par les mots-clés
+ADDED = {
+    "604f90fd-4f1c-4124-8693-8f382696475c": [f"{SPLIT_DIR}/authors/i10index/questions_with_i10index.json"],
+}
+REMOVED = {
+    "5924c77b-3954-4294-bc93-e85d1644641a": [f"{SPLIT_DIR}/authors/works/questions_with_works.json"],
+}
+
+WORD_CHAR = re.compile(r"\w")
+
+
+def compile_keywords():
+    """(pattern, rules): one pattern finding the longest keyword at every position of a lowercased text,
+    and for each keyword the (label, whole word, length) rules of itself and of the keywords it starts with."""
+    rules = {}
+    for keyword in INSTITUTION_KEYWORDS:
+        rules.setdefault(keyword.lower(), []).append(("institution", False))
+    for _, path, _, keywords, whole_word in CATEGORIES:
+        for keyword in keywords:
+            rules.setdefault(keyword.lower(), []).append((path, whole_word))
+    # Le plus long d'abord ; les mots-clés plus courts qui commencent au même endroit sont retrouvés par préfixe
+    longest_first = sorted(rules, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in longest_first) + "))")
+    prefixed_rules = {
+        keyword: [(label, whole_word, len(prefix)) for prefix in rules if keyword.startswith(prefix) for label, whole_word in rules[prefix]]
+        for keyword in rules
+    }
+    return pattern, prefixed_rules
+
+
+KEYWORD_PATTERN, KEYWORD_RULES = compile_keywords()
+
+
+def word_char(text, position):
+    return 0 <= position < len(text) and WORD_CHAR.match(text, position) is not None
+
+
+def is_boundary(text, position):
+    # Même définition que \b
+    return word_char(text, position - 1) != word_char(text, position)
+
+
+def matched_labels(question_text):
+    """Labels ("institution" and category files) whose keywords occur in the question."""
+    text = question_text.lower()
+    labels = set()
+    for match in KEYWORD_PATTERN.finditer(text):
+        start = match.start()
+        for label, whole_word, length in KEYWORD_RULES[match.group(1)]:
+            if not whole_word or (is_boundary(text, start) and is_boundary(text, start + length)):
+                labels.add(label)
+    return labels
+
+
+def classify(question):
+    """(part, category files) of a question; part is "list" for the questions about several authors."""
+    if isinstance(question.get('author_dblp_uri'), list):
+        return "list", []
+    labels = matched_labels(question.get('question', ''))
+    part = "institution" if "institution" in labels else "authors"
+    return part, [path for split, path, _, _, _ in CATEGORIES if split == part and path in labels]
+
+
+def breakdown(questions, corrections=True):
+    """{output file: [records]} of the whole breakdown, the records in the order of the question set."""
+    outputs = {LIST_URI_FILE: [], NO_LIST_URI_FILE: []}
+    outputs.update({path: [] for path in SPLIT_FILES.values()})
+    outputs.update({path: [] for _, path, _, _, _ in CATEGORIES})
+    outputs.update({path: [] for path, _ in PERSONAL_FILES.values()})
+    keys = {path: key for _, path, key, _, _ in CATEGORIES}
+    keys.update({path: key for path, key in PERSONAL_FILES.values()})
+
+    def add(path, question):
+        outputs[path].append(question if keys.get(path) is None else dict(question, key=keys[path]))
+
+    for question in questions:
+        part, categories = classify(question)
+        if part == "list":
+            add(LIST_URI_FILE, question)
+            continue
+        add(NO_LIST_URI_FILE, question)
+        add(SPLIT_FILES[part], question)
+        if corrections:
+            removed = REMOVED.get(question.get('id'), [])
+            categories = [path for path in categories if path not in removed]
+            extra = ADDED.get(question.get('id'), [])
+        else:
+            extra = []
+        for path in categories + extra:
+            add(path, question)
+        if not categories:
+            add(PERSONAL_FILES[part][0], question)
+    return outputs
+
+
+def compare(path, records):
+    # "identical", "same questions" (ordre différent) ou le nombre de questions en plus et en moins
+    try:
+        with open(path, 'r') as file:
+            existing = json.load(file)
+    except FileNotFoundError:
+        return "missing"
+    if existing == records:
+        return "identical"
+    existing_ids = [question.get('id') for question in existing]
+    ids = [question.get('id') for question in records]
+    if sorted(existing_ids) == sorted(ids):
+        return "same questions, different order"
+    return f"{len(set(ids) - set(existing_ids))} extra, {len(set(existing_ids) - set(ids))} missing"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the question set into the breakdown files in one pass.")
+    parser.add_argument("--input", default=os.path.join(BREAKDOWN_DIR, "sch_set2_test_questions.json"))
+    parser.add_argument("--output-dir", default=BREAKDOWN_DIR)
+    parser.add_argument("--check", action="store_true", help="compare with the files of the output directory instead of writing them")
+    parser.add_argument("--no-corrections", action="store_true", help="keyword rules only, without the hand-made corrections")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.input, 'r') as file:
+        questions = json.load(file)
+    outputs = breakdown(questions, corrections=not args.no_corrections)
+    classified = time.perf_counter() - start
+
+    for path, records in outputs.items():
+        output_path = os.path.join(args.output_dir, path)
+        if args.check:
+            print(f"{path}: {len(records)} questions, {compare(output_path, records)}")
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w') as file:
+            json.dump(records, file, indent=4)
+    print(f"{len(questions)} questions classified in {classified * 1000:.1f} ms, total {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -1,6 +1,8 @@
 import json
 import os
 
+from json_index import JsonIndex
+
 def load_json(filename):
     """Load a JSON file."""
     if os.path.isfile(filename):
@@ -14,8 +16,8 @@ def save_json(filename, data):
         json.dump(data, file, ensure_ascii=False, indent=4)
 
 def update_answers(questions_file, answers_file):
-    # Load the questions and answers
-    questions = load_json(questions_file)
+    # Load the answers; only the ids of the questions are needed, read from their index
+    question_ids = JsonIndex(questions_file).ids() if os.path.isfile(questions_file) else []
     answers = load_json(answers_file)
     
     # Create a set of existing answer IDs
@@ -25,9 +27,7 @@ def update_answers(questions_file, answers_file):
     answers_dict = {item['id']: item for item in answers}
     
     # Process questions and update answers
-    for question in questions:
-        question_id = question.get('id')
-        
+    for question_id in question_ids:
         if question_id not in existing_ids:
             # Add the question ID with null answer
             answers_dict[question_id] = {
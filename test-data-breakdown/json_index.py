@@ -0,0 +1,170 @@
+"""Id-indexed random access to the JSON files of the breakdown.
+
+JsonIndex scans a file once and stores, for each record, its id and the byte
+offset and length of its text in a SQLite table beside the file
+(<file>.index.sqlite3). get() and get_many() then read and decode only the
+records asked for, and iteration decodes one record at a time, so neither
+depends on the size of the file. Three layouts are supported:
+
+    [{"id": ..., ...}, ...]          question and answer files
+    {"<id>": {...}, ...}             author_institution_info.json
+    one {"id": ...} object per line  .jsonl files
+
+The index is rebuilt when the size or modification time of the file changes.
+
+    python json_index.py ../current/author_institution_info.json a8299fe5-c92f-4000-b2a3-630962240d5a
+"""
+import argparse
+import json
+import mmap
+import os
+import re
+import sqlite3
+
+# Chaînes JSON (avec échappements) et ponctuation ; le reste (nombres, true, null) n'a pas d'effet sur la structure
+TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},:]', re.DOTALL)
+
+
+def scan_records(buffer):
+    """(key or None, start, end) of each top-level value of a JSON array or object of objects."""
+    depth = 0
+    container = None
+    expect_key = True
+    key = None
+    start = None
+    for match in TOKEN_RE.finditer(buffer):
+        token = match.group()
+        if token in (b"[", b"{"):
+            if depth == 0:
+                container = token
+            elif depth == 1:
+                start = match.start()
+            depth += 1
+        elif token in (b"]", b"}"):
+            depth -= 1
+            if depth == 1:
+                yield key, start, match.end()
+                key = None
+        elif depth == 1:
+            if token == b",":
+                expect_key = True
+            elif token == b":":
+                expect_key = False
+            elif container == b"{" and expect_key:
+                key = json.loads(token)
+            else:
+                raise ValueError("only arrays and objects whose values are JSON objects can be indexed")
+
+
+def scan_lines(buffer):
+    # JSONL : un enregistrement par ligne non vide
+    start = 0
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(b"\n", start)
+        end = size if end == -1 else end
+        if buffer[start:end].strip():
+            yield None, start, end
+        start = end + 1
+
+
+class JsonIndex:
+    """Records of a JSON or JSONL file by id, read from disk on demand."""
+
+    def __init__(self, path, key='id', index_path=None):
+        self.path = path
+        self.key = key
+        self.index_path = index_path or f"{path}.index.sqlite3"
+        self._conn = sqlite3.connect(self.index_path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records (position INTEGER PRIMARY KEY, id TEXT, offset INTEGER NOT NULL, length INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_id ON records (id)")
+        if self._stored_signature() != self._signature():
+            self.rebuild()
+        self._file = open(path, 'rb')
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}:{self.key}"
+
+    def _stored_signature(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'signature'").fetchone()
+        return row[0] if row else None
+
+    def rebuild(self):
+        """Scan the file and replace the stored index."""
+        rows = []
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                buffer = b""
+            else:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            scanner = scan_lines if self.path.endswith(".jsonl") else scan_records
+            for position, (record_key, start, end) in enumerate(scanner(buffer)):
+                if record_key is None:
+                    # Tableau ou JSONL : l'identifiant est un champ de l'enregistrement
+                    record_key = json.loads(buffer[start:end]).get(self.key)
+                rows.append((position, None if record_key is None else str(record_key), start, end - start))
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        with self._conn:
+            self._conn.execute("DELETE FROM records")
+            self._conn.executemany("INSERT INTO records (position, id, offset, length) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('signature', ?)", (self._signature(),))
+        print(f"Indexed {len(rows)} records of {self.path}")
+
+    def _read(self, offset, length):
+        self._file.seek(offset)
+        return json.loads(self._file.read(length))
+
+    def get(self, record_id, default=None):
+        """Record with this id (the first one if the id repeats), or default."""
+        row = self._conn.execute(
+            "SELECT offset, length FROM records WHERE id = ? ORDER BY position LIMIT 1", (str(record_id),)
+        ).fetchone()
+        return self._read(*row) if row else default
+
+    def get_many(self, record_ids):
+        """{id: record} for the ids present in the file, read in file order."""
+        wanted = list(dict.fromkeys(str(record_id) for record_id in record_ids))
+        locations = {}
+        # Tranches sous la limite de paramètres de SQLite
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start:start + 500]
+            query = f"SELECT id, offset, length FROM records WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY position DESC"
+            for record_id, offset, length in self._conn.execute(query, chunk):
+                locations[record_id] = (offset, length)
+        return {record_id: self._read(*location) for record_id, location in sorted(locations.items(), key=lambda item: item[1][0])}
+
+    def ids(self):
+        return [record_id for (record_id,) in self._conn.execute("SELECT id FROM records ORDER BY position")]
+
+    def __contains__(self, record_id):
+        return self._conn.execute("SELECT 1 FROM records WHERE id = ? LIMIT 1", (str(record_id),)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __iter__(self):
+        # Un enregistrement décodé à la fois, dans l'ordre du fichier
+        for offset, length in self._conn.execute("SELECT offset, length FROM records ORDER BY position"):
+            yield self._read(offset, length)
+
+    def close(self):
+        self._file.close()
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a JSON/JSONL file by id and print records.")
+    parser.add_argument("path")
+    parser.add_argument("ids", nargs="*")
+    parser.add_argument("--key", default="id", help="id field of the records of arrays and JSONL files")
+    args = parser.parse_args()
+
+    index = JsonIndex(args.path, key=args.key)
+    print(f"{len(index)} records in {args.path}")
+    for record_id, record in index.get_many(args.ids).items():
+        print(record_id, json.dumps(record, ensure_ascii=False, indent=4))